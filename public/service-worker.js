@@ -23,4 +23,217 @@ self.addEventListener('notificationclick', function(event) {
             clients.openWindow(event.notification.data.url)
         );
     }
-}); 
\ No newline at end of file
+}); 
+
+// Offline copy of the calendar's appointments, kept by day in IndexedDB.
+// Range requests are answered from it once it has been brought up to date
+// with the server's delta endpoint, which sends only the rows changed or
+// deleted since the last sync. Days not kept yet are fetched and kept;
+// without a network, kept days are served as they are.
+const DB_NAME = 'shared-calendar';
+const DB_VERSION = 1;
+const RANGE_PATH = '/calendar/api/appointments/range/';
+const DELTA_PATH = '/calendar/api/appointments/delta/';
+
+self.addEventListener('install', function() {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', function(event) {
+    // Serve the open calendar without waiting for a reload
+    event.waitUntil(self.clients.claim());
+});
+
+const requestResult = (request) => new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+});
+
+const transactionDone = (transaction) => new Promise((resolve, reject) => {
+    transaction.oncomplete = () => resolve();
+    transaction.onerror = transaction.onabort = () => reject(transaction.error);
+});
+
+let database = null;
+const getDatabase = () => {
+    if (!database) {
+        const request = indexedDB.open(DB_NAME, DB_VERSION);
+        request.onupgradeneeded = () => {
+            const db = request.result;
+            // {key: 'calendar:YYYY-MM-DD', calendar, date, appointments}
+            db.createObjectStore('days', {keyPath: 'key'}).createIndex('calendar', 'calendar');
+            // {calendar, cursor}: position in the calendar's change feed
+            db.createObjectStore('calendars', {keyPath: 'calendar'});
+            // {scope, calendar}: the calendar a ?calendar= parameter ('' for none) last opened
+            db.createObjectStore('scopes', {keyPath: 'scope'});
+        };
+        database = requestResult(request);
+        database.catch(() => { database = null; });
+    }
+    return database;
+};
+
+const readRecord = async (store, key) => {
+    const db = await getDatabase();
+    return requestResult(db.transaction(store).objectStore(store).get(key));
+};
+
+const writeRecord = async (store, value) => {
+    const db = await getDatabase();
+    const transaction = db.transaction(store, 'readwrite');
+    transaction.objectStore(store).put(value);
+    return transactionDone(transaction);
+};
+
+const clearAll = async () => {
+    const db = await getDatabase();
+    const transaction = db.transaction(['days', 'calendars', 'scopes'], 'readwrite');
+    ['days', 'calendars', 'scopes'].forEach(store => transaction.objectStore(store).clear());
+    return transactionDone(transaction);
+};
+
+// YYYY-MM-DD days from start to end inclusive; empty if either is not a date
+const datesBetween = (start, end) => {
+    const dates = [];
+    const day = new Date(`${start}T00:00:00Z`);
+    const last = new Date(`${end}T00:00:00Z`);
+    if (isNaN(day) || isNaN(last)) return dates;
+    while (day <= last && dates.length < 366) {
+        dates.push(day.toISOString().split('T')[0]);
+        day.setUTCDate(day.getUTCDate() + 1);
+    }
+    return dates;
+};
+
+// Whether an appointment row occurs on a YYYY-MM-DD day, as recurrence.iter_occurrences decides
+const occursOn = (appointment, day) => {
+    if ((appointment.recurrence_exceptions || []).includes(day)) return false;
+    if (appointment.date === day) return true;
+    if (!appointment.is_recurring || appointment.date > day) return false;
+    if (appointment.recurrence_end && appointment.recurrence_end < day) return false;
+    const weekday = (new Date(`${day}T00:00:00Z`).getUTCDay() + 6) % 7;  // 0 = Monday
+    return (appointment.recurrence_days || []).includes(weekday);
+};
+
+// Apply a delta to every kept day of the calendar and move its cursor, in one transaction
+const applyDelta = async (calendar, delta) => {
+    const db = await getDatabase();
+    const transaction = db.transaction(['days', 'calendars'], 'readwrite');
+    const days = transaction.objectStore('days');
+    const touched = new Set([...delta.deleted, ...delta.changed.map(appointment => appointment.id)]);
+    if (touched.size) {
+        const kept = await requestResult(days.index('calendar').getAll(calendar));
+        kept.forEach(day => {
+            const appointments = day.appointments.filter(appointment => !touched.has(appointment.id));
+            delta.changed.forEach(appointment => {
+                if (occursOn(appointment, day.date)) {
+                    appointments.push({...appointment, occurrence_date: day.date});
+                }
+            });
+            days.put({...day, appointments});
+        });
+    }
+    transaction.objectStore('calendars').put({calendar, cursor: delta.cursor});
+    return transactionDone(transaction);
+};
+
+const fetchDelta = async (scope, since) => {
+    const params = new URLSearchParams();
+    if (scope) params.set('calendar', scope);
+    if (since !== undefined) params.set('since', since);
+    const response = await fetch(`${DELTA_PATH}?${params}`, {credentials: 'same-origin'});
+    if (response.status === 401 || response.status === 403) {
+        // Logged out, or no longer a member: keep nothing for the next user
+        await clearAll();
+    }
+    if (!response.ok) throw new Error(`Delta sync failed: ${response.status}`);
+    return response.json();
+};
+
+// Bring the kept days of the calendar `scope` opens up to date; returns its id
+const syncCalendar = async (scope) => {
+    let calendar = (await readRecord('scopes', scope) || {}).calendar;
+    for (let attempt = 0; attempt < 5; attempt++) {
+        const state = calendar === undefined ? undefined : await readRecord('calendars', calendar);
+        const delta = await fetchDelta(scope, state && state.cursor);
+        if (delta.calendar !== calendar) {
+            // The session opens another calendar than last time: sync that one
+            calendar = delta.calendar;
+            await writeRecord('scopes', {scope, calendar});
+            continue;
+        }
+        if (!state) {
+            // Nothing kept for this calendar yet: days fetched from now on are current as of this cursor
+            await writeRecord('calendars', {calendar, cursor: delta.cursor});
+            return calendar;
+        }
+        await applyDelta(calendar, delta);
+        if (!delta.more) return calendar;
+    }
+    throw new Error('Delta sync did not finish');
+};
+
+// One sync at a time, so cursors only move forward
+let syncing = Promise.resolve();
+const queueSync = (scope) => {
+    syncing = syncing.catch(() => {}).then(() => syncCalendar(scope));
+    return syncing;
+};
+
+const serveRange = async (request) => {
+    const params = new URL(request.url).searchParams;
+    const scope = params.get('calendar') || '';
+    const start = params.get('start');
+    const end = params.get('end');
+
+    let calendar;
+    let synced = false;
+    try {
+        calendar = await queueSync(scope);
+        synced = true;
+    } catch (error) {
+        console.warn('Offline cache not synced:', error);
+        calendar = (await readRecord('scopes', scope).catch(() => undefined) || {}).calendar;
+    }
+
+    const dates = datesBetween(start, end);
+    if (calendar !== undefined && dates.length) {
+        const db = await getDatabase();
+        const store = db.transaction('days').objectStore('days');
+        const kept = await Promise.all(dates.map(date => requestResult(store.get(`${calendar}:${date}`))));
+        if (kept.every(Boolean)) {
+            const appointments = {};
+            kept.forEach(day => { appointments[day.date] = day.appointments; });
+            return new Response(JSON.stringify({status: 'success', start, end, appointments}), {
+                headers: {'Content-Type': 'application/json', 'X-Cache': 'LOCAL'}
+            });
+        }
+    }
+
+    const response = await fetch(request);
+    // Only keep days read after the sync, so that later deltas cover every change since
+    if (response.ok && synced) {
+        const data = await response.clone().json();
+        if (data.status === 'success') {
+            const db = await getDatabase();
+            const transaction = db.transaction('days', 'readwrite');
+            Object.entries(data.appointments).forEach(([date, appointments]) => {
+                transaction.objectStore('days').put({key: `${calendar}:${date}`, calendar, date, appointments});
+            });
+            await transactionDone(transaction);
+        }
+    }
+    return response;
+};
+
+self.addEventListener('fetch', function(event) {
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin || url.pathname !== RANGE_PATH) {
+        return;
+    }
+    if (!self.indexedDB) return;
+    event.respondWith(serveRange(event.request).catch(error => {
+        console.warn('Offline cache failed, using the network:', error);
+        return fetch(event.request);
+    }));
+});
@@ -0,0 +1,723 @@
+"""
+Request parsing, writes and serialization shared by the appointment API's
+sync views (views.py) and async views (views_async.py).
+
+Parsers validate a request and return either the values to act on or an
+error ``JsonResponse``. Writes run in one transaction each, together with
+their change feed entries (``record_write``) and their queued notification.
+"""
+from datetime import datetime
+import hashlib
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import models, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_time
+from django.utils.http import quote_etag
+
+from . import appointment_cache
+from . import changes as change_feed
+from . import identity
+from .availability import find_conflicts, find_pending_conflicts
+from .models import Appointment
+from .outbox import enqueue_notification
+from .series import SCOPES, preview_update, update_series
+
+logger = logging.getLogger(__name__)
+
+# Fields returned by the read APIs
+APPOINTMENT_FIELDS = (
+    'id', 'calendar', 'title', 'date', 'start_time', 'end_time', 'can_watch_evee', 'user',
+    'is_recurring', 'recurrence_days', 'recurrence_end', 'recurrence_exceptions', 'series_id'
+)
+
+# Fields that can be changed through update_appointment
+EDITABLE_FIELDS = (
+    'title', 'date', 'start_time', 'end_time', 'can_watch_evee',
+    'is_recurring', 'recurrence_days', 'recurrence_end'
+)
+
+# Operations batch_appointments accepts
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+
+def parse_day(params):
+    """
+    Read the ``date`` query parameter.
+
+    Returns:
+        tuple: (date, None), or (None, error JsonResponse)
+    """
+    date = params.get('date')
+    if not date:
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Date parameter is required'
+        }, status=400)
+
+    try:
+        return datetime.strptime(date, '%Y-%m-%d').date(), None
+    except ValueError:
+        return None, JsonResponse({
+            'status': 'error',
+            'message': f'Invalid date format: {date}. Must be in YYYY-MM-DD format.'
+        }, status=400)
+
+
+def parse_range(params):
+    """
+    Read the ``start`` and ``end`` query parameters.
+
+    Returns:
+        tuple: (start date, end date, None), or (None, None, error JsonResponse)
+    """
+    start = params.get('start')
+    end = params.get('end')
+    if not start or not end:
+        return None, None, JsonResponse({
+            'status': 'error',
+            'message': 'Start and end parameters are required'
+        }, status=400)
+
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end, '%Y-%m-%d').date()
+    except ValueError:
+        return None, None, JsonResponse({
+            'status': 'error',
+            'message': f'Invalid date range: {start} to {end}. Dates must be in YYYY-MM-DD format.'
+        }, status=400)
+
+    if end_date < start_date:
+        return None, None, JsonResponse({
+            'status': 'error',
+            'message': 'End date must not be before start date'
+        }, status=400)
+
+    max_days = getattr(settings, 'SHARED_CALENDAR_MAX_RANGE_DAYS', 62)
+    if max_days is not None and (end_date - start_date).days + 1 > max_days:
+        return None, None, JsonResponse({
+            'status': 'error',
+            'message': f'Date range is limited to {max_days} days'
+        }, status=400)
+    return start_date, end_date, None
+
+
+def version_stamp():
+    """Aggregate that versions a range when caching is disabled."""
+    return {'latest': models.Max('updated_at'), 'count': models.Count('id')}
+
+
+def etag(scope, key, version, stamp=None):
+    if version is None:
+        version = f"{stamp['latest'].isoformat() if stamp['latest'] else ''}:{stamp['count']}"
+    return quote_etag(hashlib.md5(f'{scope}:{key}:{version}'.encode()).hexdigest())
+
+
+def conditional(request, etag, response=None):
+    """
+    Return a 304 for ``request`` if it already holds ``etag``, else None; or
+    tag ``response`` with ``etag`` when one is given. Clients must revalidate
+    before reusing a cached body.
+    """
+    if response is None:
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            return None
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def row(appointment):
+    """An Appointment instance as the read APIs return it."""
+    return {field: getattr(appointment, Appointment._meta.get_field(field).attname) for field in APPOINTMENT_FIELDS}
+
+
+def affected_rows(appointment):
+    """Rows a write to ``appointment`` can change, as the read APIs return them: its whole series, or itself."""
+    if appointment.series_id is None:
+        rows = Appointment.objects.filter(id=appointment.id)
+    else:
+        rows = Appointment.objects.filter(series_id=appointment.series_id)
+    return list(rows.values(*APPOINTMENT_FIELDS))
+
+
+def record_write(before, after):
+    """
+    Log a write to the change feed and invalidate the cached days it touched.
+    Call inside the write's transaction with the affected rows before and after it.
+    """
+    change_feed.record_changes(before, after)
+    rows = before + after
+
+    def invalidate():
+        for calendar_id in {row['calendar'] for row in rows}:
+            appointment_cache.invalidate(
+                identity.cache_scope(calendar_id), [row for row in rows if row['calendar'] == calendar_id]
+            )
+    transaction.on_commit(invalidate)
+
+
+def appointment_data(appointment):
+    """An appointment as the write APIs return it."""
+    return {
+        'id': appointment.id,
+        'calendar': appointment.calendar_id,
+        'user': appointment.user,
+        'title': appointment.title,
+        'date': appointment.date,
+        'start_time': appointment.start_time,
+        'end_time': appointment.end_time,
+        'can_watch_evee': appointment.can_watch_evee,
+        'is_recurring': appointment.is_recurring,
+        'recurrence_days': appointment.recurrence_days,
+        'recurrence_end': appointment.recurrence_end,
+        'series_id': appointment.series_id
+    }
+
+
+def _parse_date(value):
+    """A YYYY-MM-DD string as a date; raises ValueError for anything else."""
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+def _parse_time(value):
+    """A time of day as ``parse_time`` reads it, or None if it is malformed or out of range."""
+    try:
+        return parse_time(str(value))
+    except ValueError:
+        return None
+
+
+def _invalid_field(data):
+    """
+    Check the required fields, flags, times and weekdays of a create or
+    update body.
+
+    Returns:
+        str: What is wrong with the first malformed field, or None
+    """
+    for field in ('title', 'date', 'start_time', 'end_time'):
+        if field in data and data[field] in (None, ''):
+            return f'{field} cannot be empty'
+    for field in ('can_watch_evee', 'is_recurring'):
+        if field in data and not isinstance(data[field], bool):
+            return f'Invalid {field}: {data[field]}. Must be true or false.'
+    for field in ('start_time', 'end_time'):
+        if field in data and _parse_time(data[field]) is None:
+            return f'Invalid {field}: {data[field]}. Must be in HH:MM format.'
+    days = data.get('recurrence_days', [])
+    if not isinstance(days, list) or not all(
+        isinstance(day, int) and not isinstance(day, bool) and 0 <= day <= 6 for day in days
+    ):
+        return f'Invalid recurrence days: {days}. Must be a list of weekday numbers, 0 = Monday to 6 = Sunday.'
+    return None
+
+
+def parse_create(body, username, calendar):
+    """
+    Validate the body of a create request in ``calendar``.
+
+    Returns:
+        tuple: (Appointment field values, None), or (None, error JsonResponse)
+    """
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError as e:
+        logger.info("Create appointment rejected: invalid JSON: %s", e, extra={'user': username})
+        return None, JsonResponse({
+            'error': f'Invalid JSON data: {str(e)}'
+        }, status=400)
+    return validate_create(data, username, calendar)
+
+
+def validate_create(data, username, calendar):
+    """``parse_create`` for an already decoded body."""
+    # Validate required fields
+    required_fields = ['user', 'title', 'date', 'start_time', 'end_time']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        logger.info("Create appointment rejected: missing fields %s", missing_fields, extra={'user': username})
+        return None, JsonResponse({
+            'error': f'Missing required fields: {", ".join(missing_fields)}'
+        }, status=400)
+
+    # Validate that the user in the request matches the session user
+    if data['user'] != username:
+        logger.warning("Create appointment rejected: request user %s does not match session",
+                       data['user'], extra={'user': username})
+        return None, JsonResponse({
+            'error': 'User mismatch'
+        }, status=403)
+
+    error = _invalid_field(data)
+    if error is not None:
+        logger.info("Create appointment rejected: %s", error, extra={'user': username})
+        return None, JsonResponse({
+            'error': error
+        }, status=400)
+
+    # Validate date format
+    try:
+        date = _parse_date(data['date'])
+    except ValueError:
+        logger.info("Create appointment rejected: invalid date %r", data['date'], extra={'user': username})
+        return None, JsonResponse({
+            'error': f'Invalid date format: {data["date"]}. Must be in YYYY-MM-DD format.'
+        }, status=400)
+
+    # Extract recurrence data
+    is_recurring = data.get('is_recurring', False)
+    recurrence_end = None
+    if is_recurring and data.get('recurrence_end'):
+        try:
+            recurrence_end = _parse_date(data['recurrence_end'])
+        except ValueError:
+            return None, JsonResponse({
+                'error': f'Invalid recurrence end date: {data["recurrence_end"]}. Must be in YYYY-MM-DD format.'
+            }, status=400)
+
+    return {
+        'calendar': calendar,
+        'user': username,
+        'title': data['title'],
+        'date': date,
+        'start_time': data['start_time'],
+        'end_time': data['end_time'],
+        'can_watch_evee': data.get('can_watch_evee', False),
+        'is_recurring': is_recurring,
+        'recurrence_days': data.get('recurrence_days', []),
+        'recurrence_end': recurrence_end,
+    }, None
+
+
+def check_conflicts(fields, ignore=(), pending=()):
+    """
+    Look for appointments a new one overlaps, as ``SHARED_CALENDAR_CONFLICTS``
+    asks: ``'flag'`` (the default) reports them, ``'reject'`` refuses the
+    appointment and None skips the check. Appointments whose ids are in
+    ``ignore`` are not conflicts.
+
+    Args:
+        fields (dict): The new appointment, from ``validate_create``
+        pending (iterable): (batch index, fields) of rows the same batch
+            creates or leaves by updating, not saved yet; overlaps with
+            them are reported by the index of the operation
+
+    Returns:
+        tuple: (list of conflicts, None), or (None, error JsonResponse)
+    """
+    policy = getattr(settings, 'SHARED_CALENDAR_CONFLICTS', 'flag')
+    start_time = _parse_time(fields['start_time'])
+    end_time = _parse_time(fields['end_time'])
+    if policy is None or start_time is None or end_time is None:
+        return [], None
+
+    arguments = (
+        fields['date'], start_time, end_time,
+        fields['is_recurring'], fields['recurrence_days'], fields['recurrence_end']
+    )
+    conflicts = [
+        {'appointment_id': appointment_id, 'date': day}
+        for appointment_id, day in find_conflicts(fields['calendar'], fields['user'], *arguments)
+        if appointment_id not in ignore
+    ]
+    others = [
+        {
+            'id': index, 'date': other['date'],
+            'start_time': _parse_time(other['start_time']), 'end_time': _parse_time(other['end_time']),
+            'is_recurring': other['is_recurring'], 'recurrence_days': other['recurrence_days'],
+            'recurrence_end': other['recurrence_end'],
+            'recurrence_exceptions': other.get('recurrence_exceptions') or [],
+        }
+        for index, other in pending if other['user'] == fields['user']
+    ]
+    if others:
+        conflicts.extend({'index': index, 'date': day} for index, day in find_pending_conflicts(others, *arguments))
+    if conflicts and policy == 'reject':
+        logger.info("Create appointment rejected: %d conflicts", len(conflicts), extra={'user': fields['user']})
+        return None, JsonResponse({
+            'error': 'Appointment overlaps existing appointments',
+            'conflicts': conflicts
+        }, status=409)
+    return conflicts, None
+
+
+def create(fields):
+    """
+    Create an appointment, log it to the change feed and queue its
+    notification, in one transaction. A recurring appointment is the rule for
+    its whole series; its occurrences are expanded when a date range is read.
+    """
+    with transaction.atomic():
+        appointment = Appointment.objects.create(
+            **fields, series_id=uuid.uuid4() if fields['is_recurring'] else None
+        )
+        record_write([], affected_rows(appointment))
+        enqueue_notification(
+            title="New Appointment",
+            body=f"{appointment.user} created a new appointment: {appointment.title}",
+            data={
+                'type': 'appointment_created',
+                'appointment_id': str(appointment.id),
+                'user': appointment.user
+            },
+            calendar=appointment.calendar_id
+        )
+    return appointment
+
+
+def parse_update(body, appointment):
+    """
+    Validate the body of an update request for ``appointment``.
+
+    Returns:
+        tuple: (scope, occurrence date, changed fields, None), or
+        (None, None, None, error JsonResponse)
+    """
+    return validate_update(json.loads(body), appointment)
+
+
+def validate_update(data, appointment):
+    """``parse_update`` for an already decoded body."""
+    scope = data.get('scope', 'all')
+    if scope not in SCOPES:
+        return None, None, None, JsonResponse({
+            'status': 'error',
+            'message': f'Invalid scope: {scope}. Must be one of {", ".join(SCOPES)}.'
+        }, status=400)
+
+    occurrence_date = appointment.date
+    if data.get('occurrence_date'):
+        try:
+            occurrence_date = _parse_date(data['occurrence_date'])
+        except ValueError:
+            return None, None, None, JsonResponse({
+                'status': 'error',
+                'message': f'Invalid occurrence date: {data["occurrence_date"]}. Must be in YYYY-MM-DD format.'
+            }, status=400)
+
+    changes = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+    error = _invalid_field(changes)
+    for field in ('date', 'recurrence_end'):
+        if field not in changes:
+            continue
+        # An empty end makes a series open-ended
+        if field == 'recurrence_end' and not changes[field]:
+            changes[field] = None
+            continue
+        try:
+            changes[field] = _parse_date(changes[field])
+        except ValueError:
+            error = error or f'Invalid {field}: {changes[field]}. Must be in YYYY-MM-DD format.'
+    if error is not None:
+        return None, None, None, JsonResponse({
+            'status': 'error',
+            'message': error
+        }, status=400)
+    return scope, occurrence_date, changes, None
+
+
+def update(appointment, scope, occurrence_date, changes):
+    """
+    Update an appointment, or the requested part of its series, log it to the
+    change feed and queue its notification, in one transaction.
+
+    Returns:
+        Appointment: The row that now holds the edited occurrence
+    """
+    with transaction.atomic():
+        before = affected_rows(appointment)
+        appointment = update_series(appointment, scope, occurrence_date, changes)
+        record_write(before, affected_rows(appointment))
+        enqueue_notification(
+            title="Appointment Updated",
+            body=f"{appointment.user} updated appointment: {appointment.title}",
+            data={
+                'type': 'appointment_updated',
+                'appointment_id': str(appointment.id),
+                'user': appointment.user
+            },
+            calendar=appointment.calendar_id
+        )
+    return appointment
+
+
+def delete(appointment):
+    """Delete an appointment, log it to the change feed and queue its notification, in one transaction."""
+    appointment_id = appointment.id
+    with transaction.atomic():
+        before = affected_rows(appointment)
+        appointment.delete()
+        record_write(before, [row for row in before if row['id'] != appointment_id])
+        enqueue_notification(
+            title="Appointment Deleted",
+            body=f"{appointment.user} deleted appointment: {appointment.title}",
+            data={
+                'type': 'appointment_deleted',
+                'appointment_id': str(appointment_id),
+                'user': appointment.user
+            },
+            calendar=appointment.calendar_id
+        )
+
+
+def parse_batch(body):
+    """
+    Validate the body of a batch request, ``{"operations": [...]}``.
+
+    Returns:
+        tuple: (list of operation dicts, None), or (None, error JsonResponse)
+    """
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError as e:
+        return None, JsonResponse({
+            'status': 'error',
+            'message': f'Invalid JSON data: {str(e)}'
+        }, status=400)
+
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'operations must be a list of objects'
+        }, status=400)
+
+    max_operations = getattr(settings, 'SHARED_CALENDAR_BATCH_MAX_OPERATIONS', 200)
+    if len(operations) > max_operations:
+        return None, JsonResponse({
+            'status': 'error',
+            'message': f'A batch is limited to {max_operations} operations'
+        }, status=400)
+    return operations, None
+
+
+def _batch_error(response):
+    """A validation error response as the result of one batch operation."""
+    payload = json.loads(response.content)
+    result = {
+        'status': 'error',
+        'code': response.status_code,
+        'message': payload.get('message') or payload.get('error')
+    }
+    if 'conflicts' in payload:
+        result['conflicts'] = payload['conflicts']
+    return result
+
+
+def _batch_updates(valid):
+    """
+    The rows the valid updates of a batch change, and what they will leave.
+
+    Returns:
+        tuple: (ids of the rows changed, list of (batch index, row) for the
+        rows as the updates leave them)
+    """
+    updates = [(index, target, arguments) for index, op, target, arguments in valid if op == 'update']
+    series = {}
+    series_ids = {target.series_id for _, target, _ in updates if target.series_id is not None}
+    if series_ids:
+        for values in Appointment.objects.filter(series_id__in=series_ids).values(*APPOINTMENT_FIELDS):
+            series.setdefault(values['series_id'], []).append(values)
+
+    changed = set()
+    left = []
+    for index, target, (scope, occurrence_date, changes) in updates:
+        rows = series[target.series_id] if target.series_id is not None else [row(target)]
+        changed.update(values['id'] for values in rows)
+        left.extend(
+            (index, values) for values in preview_update(rows, row(target), scope, occurrence_date, changes)
+        )
+    return changed, left
+
+
+def _validate_batch(operations, username, calendar):
+    """
+    Validate every operation of a batch, locking the appointments it
+    updates or deletes. Creates are validated last, against the rows the
+    other operations leave.
+
+    Returns:
+        tuple: (list of results, list of (index, op, appointment or create
+        fields, update arguments) for the valid operations)
+    """
+    ids = [operation.get('id') for operation in operations if operation.get('op') in ('update', 'delete')]
+    appointments = Appointment.objects.select_for_update().filter(calendar=calendar).in_bulk(
+        [appointment_id for appointment_id in ids if isinstance(appointment_id, int)]
+    )
+    deleted = {operation.get('id') for operation in operations if operation.get('op') == 'delete'}
+
+    results = []
+    valid = []
+    creates = []
+    seen = set()
+    for index, operation in enumerate(operations):
+        op = operation.get('op')
+        result = {'index': index, 'op': op}
+        results.append(result)
+        if op not in BATCH_OPERATIONS:
+            result.update(
+                status='error', code=400, message=f'Invalid op: {op}. Must be one of {", ".join(BATCH_OPERATIONS)}.'
+            )
+            continue
+
+        if op == 'create':
+            creates.append((index, operation, result))
+            continue
+
+        appointment = appointments.get(operation.get('id'))
+        if appointment is None:
+            result.update(status='error', code=404, message='Appointment not found')
+        elif appointment.id in seen:
+            result.update(status='error', code=400, message=f'Appointment {appointment.id} appears more than once')
+        elif appointment.user != username:
+            result.update(status='error', code=403, message=f'Not authorized to {op} this appointment')
+        elif op == 'delete':
+            valid.append((index, op, appointment, None))
+        else:
+            scope, occurrence_date, changes, error = validate_update(operation, appointment)
+            if error is not None:
+                result.update(_batch_error(error))
+            else:
+                valid.append((index, op, appointment, (scope, occurrence_date, changes)))
+        if appointment is not None:
+            seen.add(appointment.id)
+
+    # Creates conflict with the calendar as the batch leaves it: not with
+    # the rows it deletes or updates, but with the rows its updates leave
+    # and with its earlier creates
+    if creates:
+        changed, pending = _batch_updates(valid)
+        ignore = deleted | changed
+        for index, operation, result in creates:
+            fields, error = validate_create(operation, username, calendar)
+            if error is None:
+                conflicts, error = check_conflicts(fields, ignore=ignore, pending=pending)
+            if error is not None:
+                result.update(_batch_error(error))
+                continue
+            result['conflicts'] = conflicts
+            valid.append((index, 'create', fields, None))
+            pending.append((index, fields))
+        valid.sort(key=lambda operation: operation[0])
+    return results, valid
+
+
+def _apply_batch(valid, results):
+    """
+    Apply validated batch operations with bulk queries where they allow it:
+    updates to appointments outside a series in one ``bulk_update``, then
+    the other updates in order, the deletes in one query and the creates in
+    one ``bulk_create``. Fills in ``results``.
+
+    Returns:
+        tuple: (before, after) snapshots of the affected rows
+    """
+    targets = [target for _, op, target, _ in valid if op != 'create']
+    series_ids = {appointment.series_id for appointment in targets if appointment.series_id is not None}
+
+    def affected(ids):
+        return list(Appointment.objects.filter(
+            models.Q(id__in=ids) | models.Q(series_id__in=series_ids)
+        ).values(*APPOINTMENT_FIELDS))
+
+    before = affected([appointment.id for appointment in targets]) if targets else []
+
+    now = timezone.now()
+    plain = []
+    plain_fields = set()
+    deletes = []
+    creates = []
+    for index, op, target, arguments in valid:
+        if op == 'create':
+            creates.append((index, Appointment(
+                **target, series_id=uuid.uuid4() if target['is_recurring'] else None
+            )))
+        elif op == 'delete':
+            deletes.append(target.id)
+            results[index].update(status='success', id=target.id)
+        else:
+            scope, occurrence_date, changes = arguments
+            if target.series_id is None and not changes.get('is_recurring'):
+                for field, value in changes.items():
+                    setattr(target, field, value)
+                target.sync_recurrence_mask()
+                target.updated_at = now
+                plain.append(target)
+                plain_fields.update(changes)
+                results[index].update(status='success', **appointment_data(target))
+            else:
+                appointment = update_series(target, scope, occurrence_date, changes)
+                series_ids.add(appointment.series_id)
+                results[index].update(status='success', **appointment_data(appointment))
+
+    if plain:
+        Appointment.objects.bulk_update(plain, [*plain_fields, 'recurrence_mask', 'updated_at'])
+    if deletes:
+        Appointment.objects.filter(id__in=deletes).delete()
+    if creates:
+        Appointment.objects.bulk_create([appointment for _, appointment in creates])
+        for index, appointment in creates:
+            results[index].update(status='success', **appointment_data(appointment))
+
+    after = affected([appointment.id for appointment in targets] + [appointment.id for _, appointment in creates])
+    return before, after
+
+
+def batch(operations, username, calendar):
+    """
+    Validate and apply a batch of operations in one transaction, then log it
+    to the change feed and queue one notification summarizing it. Nothing is
+    applied if any operation is invalid.
+
+    Returns:
+        tuple: (list of per-operation results, number of invalid operations)
+    """
+    with transaction.atomic():
+        results, valid = _validate_batch(operations, username, calendar)
+        failed = len(operations) - len(valid)
+        if failed:
+            # Valid operations are not applied either
+            for index, _, _, _ in valid:
+                results[index]['status'] = 'skipped'
+            return results, failed
+        if not valid:
+            return results, 0
+
+        before, after = _apply_batch(valid, results)
+        record_write(before, after)
+        counts = {op: sum(1 for _, kind, _, _ in valid if kind == op) for op in BATCH_OPERATIONS}
+        enqueue_notification(
+            title="Appointments Updated",
+            body=f"{username} made {len(valid)} changes: {counts['create']} created, "
+                 f"{counts['update']} updated, {counts['delete']} deleted",
+            data={
+                'type': 'appointments_batch',
+                'created': str(counts['create']),
+                'updated': str(counts['update']),
+                'deleted': str(counts['delete']),
+                'user': username
+            },
+            calendar=calendar
+        )
+    return results, 0
+
+
+def batch_response(results, failed):
+    if failed:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'{failed} of {len(results)} operations are invalid; nothing was applied',
+            'results': results
+        }, status=400)
+    return JsonResponse({
+        'status': 'success',
+        'results': results
+    })
@@ -0,0 +1,255 @@
+"""
+Per-day cache of the appointment read APIs.
+
+Each day's serialized appointments are cached under the user set they were
+read for, using the Django cache named by ``SHARED_CALENDAR_CACHE`` for
+``SHARED_CALENDAR_CACHE_TIMEOUT`` seconds (300). Caching is off unless a
+cache is named, and that cache must be shared by every server process (see
+checks.py).
+
+Writes invalidate precisely through version tokens rather than by deleting
+entries: every cached day is tagged with the token of its date and the token
+of its weekday. A one-off appointment write replaces the token of its date; a
+recurring series write replaces the tokens of its weekdays, which covers every
+date of the series however far it runs. A day read with stale tokens, even if
+it was stored after the write, is a miss. The same tokens give the version
+stamp behind the read APIs' ETags.
+"""
+from datetime import date
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .recurrence import iter_dates, weekday_mask
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    """The Django cache named by ``SHARED_CALENDAR_CACHE``, or None if caching is disabled."""
+    alias = getattr(settings, 'SHARED_CALENDAR_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _day_key(scope, day):
+    return f'shared_calendar:day:{scope}:{day.isoformat()}'
+
+
+def _date_token_key(scope, day):
+    return f'shared_calendar:date-token:{scope}:{day.isoformat()}'
+
+
+def _weekday_token_key(scope, weekday):
+    return f'shared_calendar:weekday-token:{scope}:{weekday}'
+
+
+def _count(hits, misses):
+    with _stats_lock:
+        _stats['hits'] += hits
+        _stats['misses'] += misses
+
+
+def stats():
+    """Return the day hit and miss counts of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _token_keys(scope, days):
+    keys = {_date_token_key(scope, day) for day in days}
+    keys.update(_weekday_token_key(scope, day.weekday()) for day in days)
+    return list(keys)
+
+
+def _missing_tokens(token_keys, found):
+    """
+    Fresh values for tokens that were never set or were evicted, so days
+    cached under an old value can no longer match.
+    """
+    return {key: uuid.uuid4().hex for key in token_keys if key not in found}
+
+
+def _day_tokens(scope, days, found):
+    """Map each day to its (date token, weekday token)."""
+    return {
+        day: (found.get(_date_token_key(scope, day)), found.get(_weekday_token_key(scope, day.weekday())))
+        for day in days
+    }
+
+
+def _stamp(tokens):
+    return hashlib.md5(repr(sorted(tokens.items())).encode()).hexdigest()
+
+
+def _tokens(cache, scope, days, keys=()):
+    """
+    Read ``keys`` together with the date and weekday tokens of ``days``.
+
+    Returns:
+        tuple: (cache values found, day -> (date token, weekday token))
+    """
+    token_keys = _token_keys(scope, days)
+    found = cache.get_many(list(keys) + token_keys)
+    missing = _missing_tokens(token_keys, found)
+    if missing:
+        for key, token in missing.items():
+            cache.add(key, token, timeout=None)
+        found.update(cache.get_many(list(missing)))
+    return found, _day_tokens(scope, days, found)
+
+
+async def _atokens(cache, scope, days, keys=()):
+    """Async version of ``_tokens``."""
+    token_keys = _token_keys(scope, days)
+    found = await cache.aget_many(list(keys) + token_keys)
+    missing = _missing_tokens(token_keys, found)
+    if missing:
+        for key, token in missing.items():
+            await cache.aadd(key, token, timeout=None)
+        found.update(await cache.aget_many(list(missing)))
+    return found, _day_tokens(scope, days, found)
+
+
+def _split(scope, days, found, tokens):
+    """
+    Sort days into those served by current cache entries and those missed.
+
+    Returns:
+        tuple: (ISO date -> cached appointments, list of missed days)
+    """
+    grouped = {}
+    misses = []
+    for day in days:
+        entry = found.get(_day_key(scope, day))
+        if entry is not None and entry['tokens'] == tokens[day]:
+            grouped[day.isoformat()] = entry['appointments']
+        else:
+            misses.append(day)
+    return grouped, misses
+
+
+def _entries(scope, misses, tokens, loaded):
+    return {
+        _day_key(scope, day): {'tokens': tokens[day], 'appointments': loaded[day.isoformat()]}
+        for day in misses
+    }
+
+
+def _timeout():
+    return getattr(settings, 'SHARED_CALENDAR_CACHE_TIMEOUT', 300)
+
+
+def _finish(days, grouped, misses, loaded):
+    for day in misses:
+        grouped[day.isoformat()] = loaded[day.isoformat()]
+    _count(len(days) - len(misses), len(misses))
+    return {day.isoformat(): grouped[day.isoformat()] for day in days}, not misses
+
+
+def version(scope, start, end):
+    """
+    Return a stamp that changes whenever an appointment occurring in the
+    range is written, without reading any appointments.
+
+    Returns:
+        str: The stamp, or None when caching is disabled
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    _, tokens = _tokens(cache, scope, list(iter_dates(start, end)))
+    return _stamp(tokens)
+
+
+async def aversion(scope, start, end):
+    """Async version of ``version``."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    _, tokens = await _atokens(cache, scope, list(iter_dates(start, end)))
+    return _stamp(tokens)
+
+
+def get_days(scope, start, end, load):
+    """
+    Return appointments grouped by day, reading through the cache.
+
+    Args:
+        scope (str): Identifies the set of users the appointments are read for
+        start (date): First day of the range
+        end (date): Last day of the range, inclusive
+        load (callable): ``load(start, end)`` returning ``recurrence.group_by_date``
+            output for a range; called once, for the span of the missed days
+
+    Returns:
+        tuple: (ISO date -> appointments for every day in the range, whether
+        every day was served from the cache)
+    """
+    cache = get_cache()
+    if cache is None:
+        return load(start, end), False
+
+    days = list(iter_dates(start, end))
+    found, tokens = _tokens(cache, scope, days, [_day_key(scope, day) for day in days])
+    grouped, misses = _split(scope, days, found, tokens)
+    loaded = {}
+    if misses:
+        loaded = load(misses[0], misses[-1])
+        cache.set_many(_entries(scope, misses, tokens, loaded), timeout=_timeout())
+    return _finish(days, grouped, misses, loaded)
+
+
+async def aget_days(scope, start, end, load):
+    """Async version of ``get_days``; ``load`` is a coroutine function."""
+    cache = get_cache()
+    if cache is None:
+        return await load(start, end), False
+
+    days = list(iter_dates(start, end))
+    found, tokens = await _atokens(cache, scope, days, [_day_key(scope, day) for day in days])
+    grouped, misses = _split(scope, days, found, tokens)
+    loaded = {}
+    if misses:
+        loaded = await load(misses[0], misses[-1])
+        await cache.aset_many(_entries(scope, misses, tokens, loaded), timeout=_timeout())
+    return _finish(days, grouped, misses, loaded)
+
+
+def invalidate(scope, appointments):
+    """
+    Invalidate every cached day the given appointments occur on.
+
+    Pass the rows affected by a write both as they were before it and as
+    they are after it.
+
+    Args:
+        scope (str): Identifies the set of users the appointments belong to
+        appointments (iterable): Appointment instances or ``.values()`` dicts
+            with ``date``, ``is_recurring`` and ``recurrence_days``
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+
+    keys = set()
+    for appointment in appointments:
+        if not isinstance(appointment, dict):
+            appointment = {
+                'date': appointment.date,
+                'is_recurring': appointment.is_recurring,
+                'recurrence_days': appointment.recurrence_days,
+            }
+        day = appointment['date']
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        # A series always occurs on its first day, whatever its weekdays
+        keys.add(_date_token_key(scope, day))
+        if appointment['is_recurring']:
+            mask = weekday_mask(appointment['recurrence_days'])
+            keys.update(_weekday_token_key(scope, day) for day in range(7) if mask & (1 << day))
+    if keys:
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
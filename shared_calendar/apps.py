@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class SharedCalendarConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'shared_calendar' 
\ No newline at end of file
+    name = 'shared_calendar'
+
+    def ready(self):
+        from . import checks  # noqa: F401 
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+Free/busy and conflict detection.
+
+``sweep`` turns the appointment occurrences of a date range into sorted,
+merged intervals with one pass over their start and end points: O(n log n)
+for the sort, then linear. For every user it gives the busy and free time.
+It also gives the time all users are busy at once, and the time none of
+them can watch Evee. A user can watch Evee when free or when every
+appointment they are in is marked ``can_watch_evee``.
+
+``find_conflicts`` checks a new appointment against its owner's other
+appointments in the same calendar, with the same indexed range query the
+read APIs use, narrowed by time. A recurring one is checked on every
+occurrence up to its end, or for ``recurrence.SERIES_HORIZON`` if it has
+none. ``find_pending_conflicts`` does the same against appointments not
+saved yet, such as the earlier creates of a batch.
+"""
+from datetime import datetime, timedelta
+
+from django.db import models
+
+from .models import Appointment
+from .recurrence import SERIES_HORIZON, iter_occurrences
+
+
+def _interval(day, start_time, end_time):
+    """The datetimes an occurrence spans; one ending at or before its start runs past midnight."""
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _append(intervals, start, end):
+    """Add an interval to a sorted list, merging it with the last one if they touch."""
+    if intervals and intervals[-1][1] >= start:
+        intervals[-1][1] = max(intervals[-1][1], end)
+    else:
+        intervals.append([start, end])
+
+
+def _complement(intervals, start, end):
+    free = []
+    cursor = start
+    for busy_start, busy_end in intervals:
+        if busy_start > cursor:
+            free.append([cursor, busy_start])
+        cursor = max(cursor, busy_end)
+    if cursor < end:
+        free.append([cursor, end])
+    return free
+
+
+def sweep(occurrences, users, start, end):
+    """
+    Merge appointment occurrences into free/busy intervals.
+
+    Args:
+        occurrences (iterable): Appointment dicts carrying an ``occurrence_date``,
+            as in the values of ``recurrence.group_by_date``
+        users (iterable): Users to report on
+        start (date): First day of the range
+        end (date): Last day of the range, inclusive
+
+    Returns:
+        dict: ``busy`` and ``free`` (user -> intervals), ``overlaps`` (every
+        user busy) and ``evee_gaps`` (no user able to watch Evee), each a
+        sorted list of [start, end] datetime pairs within the range
+    """
+    users = list(users)
+    window_start = datetime.combine(start, datetime.min.time())
+    window_end = datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+    # Each occurrence opens at its start and closes at its end; at equal
+    # times closes sort first so back-to-back appointments do not overlap
+    events = []
+    for appointment in occurrences:
+        if appointment['user'] not in users:
+            continue
+        occurrence_start, occurrence_end = _interval(
+            appointment['occurrence_date'], appointment['start_time'], appointment['end_time']
+        )
+        occurrence_start = max(occurrence_start, window_start)
+        occurrence_end = min(occurrence_end, window_end)
+        if occurrence_start >= occurrence_end:
+            continue
+        blocks_evee = not appointment['can_watch_evee']
+        events.append((occurrence_start, 1, appointment['user'], blocks_evee))
+        events.append((occurrence_end, -1, appointment['user'], blocks_evee))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    busy = {user: [] for user in users}
+    overlaps = []
+    evee_gaps = []
+    open_count = dict.fromkeys(users, 0)
+    blocking_count = dict.fromkeys(users, 0)
+    for index, (moment, step, user, blocks_evee) in enumerate(events):
+        open_count[user] += step
+        if blocks_evee:
+            blocking_count[user] += step
+        # Record the state that holds until the next distinct moment
+        if index + 1 < len(events) and events[index + 1][0] == moment:
+            continue
+        following = events[index + 1][0] if index + 1 < len(events) else window_end
+        if following == moment:
+            continue
+        for other in users:
+            if open_count[other]:
+                _append(busy[other], moment, following)
+        if users and all(open_count.values()):
+            _append(overlaps, moment, following)
+        if users and all(blocking_count.values()):
+            _append(evee_gaps, moment, following)
+
+    return {
+        'busy': busy,
+        'free': {user: _complement(intervals, window_start, window_end) for user, intervals in busy.items()},
+        'overlaps': overlaps,
+        'evee_gaps': evee_gaps,
+    }
+
+
+def _new_occurrences(date, is_recurring, recurrence_days, recurrence_end):
+    """The days a new appointment occurs on, following an open-ended series for ``SERIES_HORIZON``."""
+    candidate = {
+        'date': date,
+        'is_recurring': is_recurring,
+        'recurrence_days': recurrence_days,
+        'recurrence_end': recurrence_end,
+        'recurrence_exceptions': [],
+    }
+    last = (recurrence_end or date + SERIES_HORIZON) if is_recurring else date
+    return list(iter_occurrences(candidate, date, last))
+
+
+def _overlapping(rows, days, start_time, end_time):
+    """(row id, ISO date) of each occurrence of ``rows`` that overlaps the new appointment on ``days``."""
+    first, last = days[0] - timedelta(days=1), days[-1] + timedelta(days=1)
+    # An existing occurrence can only overlap the new ones of its own day
+    # and the days either side, so look those up rather than compare them all
+    new_intervals = {day: _interval(day, start_time, end_time) for day in days}
+    conflicts = []
+    for row in rows:
+        for day in iter_occurrences(row, first, last):
+            existing_start, existing_end = _interval(day, row['start_time'], row['end_time'])
+            for near in (day - timedelta(days=1), day, day + timedelta(days=1)):
+                interval = new_intervals.get(near)
+                if interval is not None and interval[0] < existing_end and existing_start < interval[1]:
+                    conflicts.append((row['id'], day.isoformat()))
+                    break
+    return conflicts
+
+
+def find_conflicts(calendar, user, date, start_time, end_time, is_recurring=False, recurrence_days=(), recurrence_end=None):
+    """
+    Return the appointments of ``user`` in ``calendar`` that overlap a new one.
+
+    A recurring appointment is checked on each of its occurrences up to
+    ``recurrence_end``, or for ``SERIES_HORIZON`` past its first day when it
+    has no end.
+
+    Args:
+        start_time (time): Start of the new appointment
+        end_time (time): End of the new appointment; if it is not after the
+            start, the appointment runs past midnight
+
+    Returns:
+        list: (appointment id, ISO date) pairs, one per overlapping occurrence
+    """
+    days = _new_occurrences(date, is_recurring, recurrence_days, recurrence_end)
+    if not days:
+        return []
+
+    # Appointments running past midnight reach into the next day, so look a
+    # day either side and compare exact intervals below
+    first, last = days[0] - timedelta(days=1), days[-1] + timedelta(days=1)
+    nearby = Appointment.objects.filter(calendar=calendar, user=user).in_range(first, last)
+    if start_time < end_time:
+        # Narrow by time of day in the query; overnight rows always qualify
+        nearby = nearby.filter(
+            (models.Q(start_time__lt=end_time) & models.Q(end_time__gt=start_time))
+            | models.Q(end_time__lte=models.F('start_time'))
+        )
+    rows = nearby.values(
+        'id', 'date', 'start_time', 'end_time', 'is_recurring', 'recurrence_days',
+        'recurrence_end', 'recurrence_exceptions'
+    )
+    return _overlapping(rows, days, start_time, end_time)
+
+
+def find_pending_conflicts(pending, date, start_time, end_time, is_recurring=False, recurrence_days=(),
+                           recurrence_end=None):
+    """
+    ``find_conflicts`` against appointments not saved yet, such as the
+    earlier creates of a batch.
+
+    Args:
+        pending (iterable): Appointments as dicts with an ``id`` of the
+            caller's choosing and the fields ``find_conflicts`` takes, with
+            ``start_time`` and ``end_time`` as times
+
+    Returns:
+        list: (pending id, ISO date) pairs, one per overlapping occurrence
+    """
+    days = _new_occurrences(date, is_recurring, recurrence_days, recurrence_end)
+    if not days:
+        return []
+    rows = [{'recurrence_exceptions': [], **appointment} for appointment in pending]
+    return _overlapping(rows, days, start_time, end_time)
@@ -0,0 +1,10 @@
+"""
+Benchmarks for the calendar's hot paths.
+
+``manage.py benchmark_calendar`` seeds a throwaway test database with
+synthetic appointments and push subscriptions (``seed``), then drives the
+API views through the test client and the notification fan-out against a
+local stub push service (``pushstub``). Each scenario (``scenarios``)
+reports latency percentiles, throughput and database queries per
+operation, as JSON that can be compared between versions.
+"""
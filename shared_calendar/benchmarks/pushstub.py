@@ -0,0 +1,78 @@
+"""
+A local stand-in for a web push service.
+
+It accepts every push with ``201 Created`` after an optional delay, so the
+notification fan-out can be measured without reaching a real push service.
+Keys come from ``cryptography``, which pywebpush already depends on.
+"""
+import base64
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+class PushServer:
+    """
+    Push service on a free local port, serving from a background thread.
+
+    Args:
+        latency (float): Seconds to wait before answering each push
+    """
+
+    def __init__(self, latency=0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open, as push services do
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if latency:
+                    time.sleep(latency)
+                with server._lock:
+                    server.received += 1
+                self.send_response(201)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.received = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._httpd.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def subscription(endpoint):
+    """Subscription info, as browsers send it, for ``endpoint`` with fresh keys."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    public_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return {'endpoint': endpoint, 'keys': {'p256dh': _b64(public_key), 'auth': _b64(os.urandom(16))}}
+
+
+def vapid_private_key():
+    """A new VAPID private key in the form ``WEBPUSH_SETTINGS['VAPID_PRIVATE_KEY']`` takes."""
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    private_value = ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value
+    return _b64(private_value.to_bytes(32, 'big'))
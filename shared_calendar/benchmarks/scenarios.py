@@ -0,0 +1,230 @@
+"""
+The benchmark scenarios.
+
+Each scenario runs one operation ``iterations`` times and returns
+``summarize``'s statistics for it. API scenarios go through the test
+client, so latencies include URL routing, middleware and serialization but
+no network. Query counts are captured around every operation.
+"""
+from datetime import timedelta
+import json
+import math
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .. import notifications
+from ..appointment_cache import get_cache
+from ..models import Appointment
+from ..recurrence import iter_occurrences
+from .seed import START
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def summarize(name, latencies, queries, elapsed, **extra):
+    """
+    Statistics for one scenario.
+
+    Args:
+        latencies (list): Seconds taken by each operation
+        queries (list): Database queries made by each operation
+        elapsed (float): Seconds spent in the timed operations
+        extra: Scenario-specific figures to include
+    """
+    ordered = sorted(latencies)
+    return {
+        'scenario': name,
+        'operations': len(latencies),
+        'throughput_per_s': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'p50': round(_percentile(ordered, 50) * 1000, 3),
+            'p90': round(_percentile(ordered, 90) * 1000, 3),
+            'p99': round(_percentile(ordered, 99) * 1000, 3),
+            'max': round(ordered[-1] * 1000, 3),
+            'mean': round(sum(ordered) / len(ordered) * 1000, 3),
+        },
+        'queries': {
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries),
+        },
+        **extra,
+    }
+
+
+def _measure(operation, iterations, before=None):
+    """
+    Time ``operation(index)`` for each iteration. ``before(index)``, if given,
+    runs first and is not timed.
+    """
+    latencies = []
+    queries = []
+    elapsed = 0
+    for index in range(iterations):
+        if before is not None:
+            before(index)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            operation(index)
+            latencies.append(time.perf_counter() - started)
+        elapsed += latencies[-1]
+        queries.append(len(captured))
+    return latencies, queries, elapsed
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.status_code} from {response.request["PATH_INFO"]}: {response.content[:200]!r}')
+    return response
+
+
+def client(username):
+    """A test client logged in as ``username`` the way the main site does it."""
+    client = Client()
+    session = client.session
+    session['user'] = json.dumps({'username': username})
+    session.save()
+    return client
+
+
+def _day(context, index):
+    return START + timedelta(days=(index * 7919) % context['days'])
+
+
+def _clear_cache(index):
+    cache = get_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def get_appointments(context, iterations):
+    """Read single days, each from the database."""
+    api = context['clients'][context['users'][0]]
+
+    def read(index):
+        _check(api.get('/calendar/api/appointments/get/', {'date': _day(context, index).isoformat()}))
+
+    return summarize('get_appointments', *_measure(read, iterations, before=_clear_cache))
+
+
+def get_appointments_cached(context, iterations):
+    """Read single days that are already cached."""
+    api = context['clients'][context['users'][0]]
+    days = [_day(context, index).isoformat() for index in range(7)]
+    for day in days:
+        _check(api.get('/calendar/api/appointments/get/', {'date': day}))
+
+    def read(index):
+        _check(api.get('/calendar/api/appointments/get/', {'date': days[index % len(days)]}))
+
+    return summarize('get_appointments_cached', *_measure(read, iterations))
+
+
+def get_appointments_range(context, iterations):
+    """Read four-week ranges from the database, expanding every recurring series in them."""
+    api = context['clients'][context['users'][0]]
+
+    def read(index):
+        start = _day(context, index)
+        _check(api.get('/calendar/api/appointments/range/', {
+            'start': start.isoformat(), 'end': (start + timedelta(days=27)).isoformat()
+        }))
+
+    return summarize('get_appointments_range', *_measure(read, iterations, before=_clear_cache))
+
+
+def _create(context, iterations, name, recurring):
+    username = context['users'][0]
+    api = context['clients'][username]
+    rng = context['rng']
+
+    def create(index):
+        hour = rng.randint(6, 21)
+        body = {
+            'user': username,
+            'title': f'Created {index}',
+            'date': _day(context, index).isoformat(),
+            'start_time': f'{hour:02d}:00',
+            'end_time': f'{hour + 1:02d}:00',
+        }
+        if recurring:
+            body.update(is_recurring=True, recurrence_days=sorted(rng.sample(range(7), 2)))
+        _check(api.post('/calendar/api/appointments/create/', json.dumps(body), content_type='application/json'))
+
+    return summarize(name, *_measure(create, iterations))
+
+
+def create_appointment(context, iterations):
+    """Create one-off appointments, conflict check included."""
+    return _create(context, iterations, 'create_appointment', recurring=False)
+
+
+def create_recurring_appointment(context, iterations):
+    """Create recurring appointments, conflict check over every occurrence up to ``SERIES_HORIZON`` included."""
+    return _create(context, iterations, 'create_recurring_appointment', recurring=True)
+
+
+def update_series(context, iterations):
+    """Edit recurring series, cycling through the single, following and all scopes."""
+    series = list(Appointment.objects.filter(
+        calendar=context['calendar'], is_recurring=True
+    ).order_by('id').values(
+        'id', 'user', 'date', 'is_recurring', 'recurrence_days', 'recurrence_end', 'recurrence_exceptions'
+    ))
+    if not series:
+        raise RuntimeError('update_series needs recurring appointments; seed some with --recurring')
+    scopes = ('single', 'following', 'all')
+
+    def update(index):
+        row = series[index % len(series)]
+        occurrences = iter_occurrences(row, row['date'] + timedelta(days=1), row['date'] + timedelta(days=60))
+        occurrence = next(occurrences, row['date'])
+        _check(context['clients'][row['user']].post(
+            f"/calendar/api/appointments/{row['id']}/update/",
+            json.dumps({
+                'scope': scopes[index % len(scopes)],
+                'occurrence_date': occurrence.isoformat(),
+                'title': f'Edited {index}',
+            }),
+            content_type='application/json'
+        ))
+
+    return summarize('update_series', *_measure(update, iterations))
+
+
+def send_notification(context, iterations):
+    """Push a notification to the calendar's members' subscriptions through the stub push service."""
+    server = context['push_server']
+    # The first send imports the push libraries and opens the connections
+    notifications.send_notification('Benchmark', 'Warm-up', {'type': 'benchmark'}, context['calendar'])
+    received = server.received
+    failures = 0
+
+    def send(index):
+        nonlocal failures
+        results = notifications.send_notification(
+            'Benchmark', f'Notification {index}', {'type': 'benchmark'}, context['calendar']
+        )
+        failures += sum(1 for result in results.values() if not result['success'])
+
+    latencies, queries, elapsed = _measure(send, iterations)
+    pushes = server.received - received
+    return summarize(
+        'send_notification', latencies, queries, elapsed,
+        pushes=pushes,
+        pushes_per_s=round(pushes / elapsed, 1) if elapsed else None,
+        failed_pushes=failures,
+    )
+
+
+SCENARIOS = {
+    scenario.__name__: scenario for scenario in (
+        get_appointments, get_appointments_cached, get_appointments_range, create_appointment,
+        create_recurring_appointment, update_series, send_notification,
+    )
+}
@@ -0,0 +1,83 @@
+"""Synthetic data for the benchmarks."""
+from datetime import date, time, timedelta
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+
+from ..models import Appointment, Calendar, CalendarMembership, PushSubscription
+
+# First day of the seeded appointments
+START = date(2025, 1, 6)
+
+# Members of the calendar the scenarios use
+USERS = ('benchmark-a', 'benchmark-b')
+
+
+def seed(users=USERS, one_off=1000, recurring=100, subscriptions=0, days=365, push_url=None, rng=None,
+         calendars=1):
+    """
+    Create ``calendars`` calendars with appointments spread over ``days``
+    days from ``START``, and active push subscriptions pointing at
+    ``push_url``. The first calendar is shared by ``users`` and the owners
+    of the subscriptions; the others, with members of their own, only add
+    rows for its reads to skip.
+
+    Args:
+        users (list): Usernames the appointments are shared between
+        one_off (int): One-off appointments to create per calendar
+        recurring (int): Recurring series to create per calendar, each one rule row
+        subscriptions (int): Push subscriptions to create
+        rng (random.Random): Source of randomness, for reproducible data
+
+    Returns:
+        dict: The numbers of rows created
+    """
+    from . import pushstub
+
+    rng = rng or random.Random(0)
+
+    def appointment(calendar, members, is_recurring):
+        start_hour = rng.randint(6, 21)
+        first = START + timedelta(days=rng.randrange(days))
+        return Appointment(
+            calendar=calendar,
+            user=rng.choice(members),
+            title=f'Benchmark {rng.randrange(10 ** 6)}',
+            date=first,
+            start_time=time(start_hour, rng.choice((0, 30))),
+            end_time=time(start_hour + 1, rng.choice((0, 30))),
+            can_watch_evee=rng.random() < 0.3,
+            is_recurring=is_recurring,
+            recurrence_days=sorted(rng.sample(range(7), rng.randint(1, 3))) if is_recurring else [],
+            recurrence_end=first + timedelta(days=rng.randint(30, days)) if is_recurring and rng.random() < 0.5 else None,
+            series_id=uuid.uuid4() if is_recurring else None,
+        )
+
+    created = Calendar.objects.bulk_create([
+        Calendar(name=f'Benchmark {index}', slug=f'benchmark-{index}') for index in range(calendars)
+    ])
+    for index, calendar in enumerate(created):
+        members = list(users) if index == 0 else [f'{username}-{index}' for username in users]
+        CalendarMembership.objects.bulk_create([
+            CalendarMembership(calendar=calendar, username=username) for username in members
+        ])
+        Appointment.objects.bulk_create(
+            [appointment(calendar, members, False) for _ in range(one_off)]
+            + [appointment(calendar, members, True) for _ in range(recurring)]
+        )
+
+    if subscriptions:
+        # Subscriptions belong to the project's user model, whichever it is
+        user_model = get_user_model()
+        owners = user_model.objects.bulk_create([
+            user_model(**{user_model.USERNAME_FIELD: f'benchmark-subscriber-{index}'}) for index in range(subscriptions)
+        ])
+        CalendarMembership.objects.bulk_create([
+            CalendarMembership(calendar=created[0], username=owner.get_username()) for owner in owners
+        ])
+        PushSubscription.objects.bulk_create([
+            PushSubscription(user=owner, subscription_info=pushstub.subscription(f'{push_url}/{owner.get_username()}'))
+            for owner in owners
+        ])
+    return {'calendars': calendars, 'one_off': one_off, 'recurring': recurring, 'subscriptions': subscriptions}
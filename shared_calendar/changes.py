@@ -0,0 +1,222 @@
+"""
+Live feed of appointment changes.
+
+The write views append an ``AppointmentChange`` for every row they create,
+update or delete, and clients read the entries after the last one they saw
+(their cursor) instead of reloading whole days. Waiting clients only watch a
+counter in the cache, which every commit bumps; the database is queried when
+it moves. With caching disabled they poll the latest entry id instead.
+
+A change with a lower id can commit after one with a higher id, so the
+cursor handed back stops before any recent gap in the ids; the entries after
+it are sent again on the next read. Entries carry whole rows, so applying
+one twice is harmless.
+
+Each calendar reads only its own entries. Cursors are ids in the shared
+feed, so a calendar's entries are not consecutive; a gap before a recent
+one is only waited on if it is not filled by other calendars' entries.
+"""
+import asyncio
+from datetime import timedelta
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.utils import timezone
+
+from .appointment_cache import get_cache
+from .models import AppointmentChange
+
+VERSION_KEY = 'shared_calendar:changes:version'
+
+# How long a gap in the change ids may be waited on before it is taken to be
+# a rolled back transaction rather than one still committing
+GAP_TIMEOUT = timedelta(seconds=5)
+
+
+def _bump():
+    cache = get_cache()
+    if cache is None:
+        return
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def record_changes(before, after):
+    """
+    Append the difference between two snapshots of the rows a write touched.
+
+    Must be called inside the write's transaction; waiting clients are woken
+    once it commits.
+
+    Args:
+        before (list): Row dicts, as the read APIs return them, before the write
+        after (list): The same rows after it; missing rows were deleted
+
+    Returns:
+        list: The AppointmentChange entries created
+    """
+    before = {row['id']: row for row in before}
+    after = {row['id']: row for row in after}
+    entries = [
+        AppointmentChange(
+            action=AppointmentChange.DELETED, calendar_id=row['calendar'], appointment_id=row['id'],
+            series_id=row['series_id'], user=row['user'], data=None
+        )
+        for appointment_id, row in before.items() if appointment_id not in after
+    ]
+    entries.extend(
+        AppointmentChange(
+            action=AppointmentChange.UPDATED if appointment_id in before else AppointmentChange.CREATED,
+            calendar_id=row['calendar'], appointment_id=row['id'], series_id=row['series_id'],
+            user=row['user'], data=row
+        )
+        for appointment_id, row in after.items() if before.get(appointment_id) != row
+    )
+    if not entries:
+        return []
+    entries = AppointmentChange.objects.bulk_create(entries)
+    transaction.on_commit(_bump)
+    return entries
+
+
+def latest_cursor():
+    """Return the id of the newest change, or 0 if there are none."""
+    return AppointmentChange.objects.aggregate(latest=models.Max('id'))['latest'] or 0
+
+
+def _serialize(change):
+    return {
+        'cursor': change.id,
+        'action': change.action,
+        'appointment_id': change.appointment_id,
+        'series_id': change.series_id,
+        'user': change.user,
+        'appointment': change.data,
+        'created_at': change.created_at,
+    }
+
+
+def _filled(after, before):
+    """Whether every id between two entries belongs to a committed entry."""
+    return AppointmentChange.objects.filter(id__gt=after, id__lt=before).count() == before - after - 1
+
+
+def changes_since(cursor, limit=500, calendar_id=None):
+    """
+    Return the changes after ``cursor``, oldest first, only those of
+    ``calendar_id`` if given.
+
+    Returns:
+        tuple: (list of change dicts, cursor to read from next)
+    """
+    changes = AppointmentChange.objects.filter(id__gt=cursor)
+    if calendar_id is not None:
+        changes = changes.filter(calendar_id=calendar_id)
+    changes = list(changes.order_by('id')[:limit])
+    next_cursor = cursor
+    settled = timezone.now() - GAP_TIMEOUT
+    for change in changes:
+        if change.id != next_cursor + 1 and change.created_at > settled:
+            if calendar_id is None or not _filled(next_cursor, change.id):
+                break
+        next_cursor = change.id
+    return [_serialize(change) for change in changes], next_cursor
+
+
+def delta_since(cursor, calendar_id, limit=500):
+    """
+    The net effect of the changes to a calendar after ``cursor``, for
+    clients that keep their own copy of its appointments: the latest row of
+    each changed appointment and the ids of deleted ones, however many
+    times each was written.
+
+    Returns:
+        dict: ``changed`` rows, ``deleted`` ids, the ``cursor`` to read from
+        next and whether there are ``more`` changes after this batch
+    """
+    changes, next_cursor = changes_since(cursor, limit, calendar_id)
+    changed = {}
+    deleted = set()
+    for change in changes:
+        if change['action'] == AppointmentChange.DELETED:
+            changed.pop(change['appointment_id'], None)
+            deleted.add(change['appointment_id'])
+        else:
+            changed[change['appointment_id']] = change['appointment']
+            deleted.discard(change['appointment_id'])
+    return {
+        'changed': list(changed.values()),
+        'deleted': sorted(deleted),
+        'cursor': next_cursor,
+        'more': len(changes) == limit,
+    }
+
+
+def _version():
+    cache = get_cache()
+    if cache is None:
+        return latest_cursor()
+    return cache.get(VERSION_KEY, 0)
+
+
+def wait_for_changes(cursor, timeout, interval=1, calendar_id=None):
+    """
+    Block until there are changes after ``cursor`` or ``timeout`` seconds
+    pass, only watching for those of ``calendar_id`` if given.
+
+    Returns:
+        tuple: As ``changes_since``; no changes if the wait timed out
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        # Read the version first, so a commit after the query still wakes us
+        version = _version()
+        changes, next_cursor = changes_since(cursor, calendar_id=calendar_id)
+        if next_cursor != cursor or time.monotonic() >= deadline:
+            return changes, next_cursor
+        if changes:
+            # Only entries held back behind a gap: look again shortly
+            time.sleep(interval)
+            continue
+        while _version() == version and time.monotonic() < deadline:
+            time.sleep(interval)
+
+
+async def stream_changes(cursor, timeout, interval=1, keepalive=15, calendar_id=None):
+    """
+    Yield ``(changes, cursor)`` batches as they happen, for ``timeout``
+    seconds, only those of ``calendar_id`` if given. An empty batch is
+    yielded after ``keepalive`` quiet seconds so that idle connections can
+    be kept open.
+    """
+    cache = get_cache()
+    deadline = time.monotonic() + timeout
+    quiet_since = time.monotonic()
+    version = None
+    while time.monotonic() < deadline:
+        if cache is not None:
+            current = await cache.aget(VERSION_KEY, 0)
+        else:
+            current = await sync_to_async(latest_cursor)()
+        if current != version:
+            version = current
+            changes, next_cursor = await sync_to_async(changes_since)(cursor, calendar_id=calendar_id)
+            if next_cursor != cursor:
+                cursor = next_cursor
+                quiet_since = time.monotonic()
+                yield changes, cursor
+                # There may be more than one batch waiting
+                version = None
+                continue
+            if changes:
+                # Only entries held back behind a gap: look again shortly
+                version = None
+        if time.monotonic() - quiet_since >= keepalive:
+            quiet_since = time.monotonic()
+            yield [], cursor
+        await asyncio.sleep(interval)
@@ -0,0 +1,39 @@
+"""
+System checks for the app's settings, run by ``manage.py check`` and when
+the server starts.
+"""
+from django.conf import settings
+from django.core import checks
+
+# Cache backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@checks.register(checks.Tags.caches)
+def check_appointment_cache(app_configs, **kwargs):
+    """
+    The appointment cache and the change feed's counter must be seen by
+    every server process: a write only replaces the version tokens of the
+    process that handled it, so the others would keep serving, and
+    answering 304 for, the days it changed.
+    """
+    alias = getattr(settings, 'SHARED_CALENDAR_CACHE', None)
+    if not alias:
+        return []
+    config = settings.CACHES.get(alias)
+    if config is None:
+        return [checks.Error(
+            f"SHARED_CALENDAR_CACHE names the cache '{alias}', which is not in CACHES.",
+            id='shared_calendar.E001',
+        )]
+    if config.get('BACKEND') in PROCESS_LOCAL_CACHES:
+        return [checks.Warning(
+            f"SHARED_CALENDAR_CACHE uses the cache '{alias}', which is private to each process.",
+            hint=(
+                'With more than one server process, writes leave the other processes serving '
+                'stale appointments. Use a shared backend such as Redis or Memcached, or set '
+                'SHARED_CALENDAR_CACHE = None.'
+            ),
+            id='shared_calendar.W001',
+        )]
+    return []
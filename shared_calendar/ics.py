@@ -0,0 +1,281 @@
+"""
+iCalendar (RFC 5545) export and import.
+
+Recurring rules become one VEVENT with an RRULE and EXDATEs rather than an
+event per occurrence; the one-off rows that replace single occurrences of a
+series are exported as events of their own. Times are stored without a
+time zone, so they are written as floating local times.
+
+``read_events`` goes the other way for the importer. It understands the
+weekly and daily rules appointments can express and reports anything else
+as an error for that event.
+"""
+from datetime import datetime, timedelta, timezone
+import re
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone as django_timezone
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Fields ``events`` reads from each appointment row
+FEED_FIELDS = (
+    'id', 'user', 'title', 'date', 'start_time', 'end_time', 'can_watch_evee', 'is_recurring',
+    'recurrence_days', 'recurrence_end', 'recurrence_exceptions', 'updated_at'
+)
+
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold a content line to 75 octets, continuing with a leading space."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Never split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _local(day, time_of_day):
+    return datetime.combine(day, time_of_day).strftime('%Y%m%dT%H%M%S')
+
+
+def _utc(moment):
+    return moment.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event(appointment, domain='shared_calendar'):
+    """
+    Return the VEVENT for an appointment row as folded content lines.
+
+    Args:
+        appointment (dict): Row with the ``FEED_FIELDS``
+        domain (str): Right-hand side of the event UIDs
+    """
+    start = appointment['date']
+    end = start
+    if appointment['end_time'] <= appointment['start_time']:
+        # Runs past midnight
+        end = start + timedelta(days=1)
+
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:appointment-{appointment['id']}@{domain}",
+        f"DTSTAMP:{_utc(appointment['updated_at'])}",
+        f"LAST-MODIFIED:{_utc(appointment['updated_at'])}",
+        f"DTSTART:{_local(start, appointment['start_time'])}",
+        f"DTEND:{_local(end, appointment['end_time'])}",
+        f"SUMMARY:{_escape(appointment['title'])}",
+        'DESCRIPTION:' + _escape(
+            f"{appointment['user']}" + (' (can watch Evee)' if appointment['can_watch_evee'] else '')
+        ),
+    ]
+    if appointment['is_recurring']:
+        days = sorted({int(day) for day in appointment['recurrence_days'] or [] if 0 <= int(day) <= 6})
+        rule = 'RRULE:FREQ=WEEKLY'
+        if days:
+            rule += ';BYDAY=' + ','.join(WEEKDAYS[day] for day in days)
+        if appointment['recurrence_end']:
+            rule += f";UNTIL={_local(appointment['recurrence_end'], appointment['start_time'])}"
+        lines.append(rule)
+        exceptions = sorted(appointment['recurrence_exceptions'] or [])
+        if exceptions:
+            lines.append('EXDATE:' + ','.join(
+                _local(datetime.strptime(day, '%Y-%m-%d').date(), appointment['start_time'])
+                for day in exceptions
+            ))
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def calendar(appointments, name='Shared Calendar', domain='shared_calendar'):
+    """
+    Yield an iCalendar document piece by piece, one event at a time.
+
+    Args:
+        appointments (iterable): Rows with the ``FEED_FIELDS``; consumed lazily
+        name (str): Calendar name shown by clients
+        domain (str): Right-hand side of the event UIDs
+    """
+    yield ''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//shared_calendar//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ))
+    for appointment in appointments:
+        yield event(appointment, domain)
+    yield 'END:VCALENDAR\r\n'
+
+
+def _unescape(text):
+    return re.sub(r'\\([\\;,nN])', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), text)
+
+
+def _unfold(lines):
+    """Yield (line number, content line) with folded lines joined."""
+    pending = None
+    start = 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending:
+            yield start, pending
+        pending, start = line, number
+    if pending:
+        yield start, pending
+
+
+def _property(line):
+    """Split a content line into (name, parameters, value)."""
+    head, _, value = line.partition(':')
+    name, *params = head.split(';')
+    params = dict(param.partition('=')[::2] for param in params)
+    return name.upper(), {key.upper(): setting for key, setting in params.items()}, value
+
+
+def _moment(params, value):
+    """
+    Parse a DATE or DATE-TIME value into a naive local datetime, and whether
+    it was a plain date. UTC and TZID times are converted to the current
+    time zone; floating times are taken as they are.
+    """
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, '%Y%m%d'), True
+    moment = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if value.endswith('Z'):
+        zone = timezone.utc
+    elif 'TZID' in params:
+        try:
+            zone = ZoneInfo(params['TZID'].strip('"'))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone {params['TZID']}")
+    else:
+        return moment, False
+    local = moment.replace(tzinfo=zone).astimezone(django_timezone.get_current_timezone())
+    return local.replace(tzinfo=None), False
+
+
+def _duration(value):
+    match = re.fullmatch(r'P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?', value.strip())
+    if not match:
+        raise ValueError(f'Unsupported DURATION {value}')
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def _rule(value, params_start, start):
+    """Turn an RRULE into (recurrence days, recurrence end)."""
+    rule = dict(part.upper().partition('=')[::2] for part in value.split(';') if part)
+    if rule.get('FREQ') not in ('WEEKLY', 'DAILY'):
+        raise ValueError(f"Unsupported recurrence FREQ={rule.get('FREQ')}; only WEEKLY and DAILY can be imported")
+    if rule.get('INTERVAL', '1') != '1':
+        raise ValueError('Recurrence intervals other than 1 cannot be imported')
+    if 'COUNT' in rule:
+        raise ValueError('Recurrence COUNT cannot be imported; use UNTIL')
+    if rule['FREQ'] == 'DAILY':
+        days = list(range(7))
+    elif 'BYDAY' in rule:
+        try:
+            days = sorted({WEEKDAYS.index(day.strip()[-2:]) for day in rule['BYDAY'].split(',')})
+        except ValueError:
+            raise ValueError(f"Unsupported BYDAY={rule['BYDAY']}")
+    else:
+        days = [start.weekday()]
+    end = None
+    if 'UNTIL' in rule:
+        end = _moment(params_start, rule['UNTIL'])[0].date()
+    return days, end
+
+
+def _record(event):
+    """Map the properties of one VEVENT to appointment fields."""
+    if 'DTSTART' not in event:
+        raise ValueError('Event has no DTSTART')
+    params, value = event['DTSTART']
+    start, all_day = _moment(params, value)
+    if 'DTEND' in event:
+        end = _moment(*event['DTEND'])[0]
+    elif 'DURATION' in event:
+        end = start + _duration(event['DURATION'][1])
+    else:
+        end = start + (timedelta(days=1) if all_day else timedelta())
+    if end - start > timedelta(days=1) or end < start:
+        raise ValueError('Events longer than a day cannot be imported')
+
+    record = {
+        'title': _unescape(event.get('SUMMARY', ({}, ''))[1]) or '(No title)',
+        'date': start.date().isoformat(),
+        # An end at or before the start runs past midnight, so a whole day is 00:00 to 00:00
+        'start_time': start.time().isoformat(),
+        'end_time': end.time().isoformat(),
+        'can_watch_evee': False,
+        'is_recurring': False,
+        'recurrence_days': [],
+        'recurrence_end': None,
+        'recurrence_exceptions': [],
+    }
+    if 'RRULE' in event:
+        days, recurrence_end = _rule(event['RRULE'][1], params, start)
+        exceptions = sorted({
+            _moment(exdate_params, exdate)[0].date().isoformat()
+            for exdate_params, values in event.get('EXDATE', [])
+            for exdate in values.split(',')
+        })
+        record.update(
+            is_recurring=True, recurrence_days=days,
+            recurrence_end=recurrence_end.isoformat() if recurrence_end else None,
+            recurrence_exceptions=exceptions
+        )
+    return record
+
+
+def read_events(lines):
+    """
+    Parse the VEVENTs of an iCalendar document as it is read.
+
+    Events overriding one occurrence of a series (RECURRENCE-ID) are read as
+    one-off appointments.
+
+    Args:
+        lines (iterable): Text lines, e.g. an open file
+
+    Yields:
+        tuple: (line number of the event, appointment fields as strings and
+        lists, or None, error message or None)
+    """
+    event = None
+    start = 0
+    for number, line in _unfold(lines):
+        name, params, value = _property(line)
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event, start = {}, number
+        elif event is None:
+            continue
+        elif name == 'END' and value.upper() == 'VEVENT':
+            try:
+                yield start, _record(event), None
+            except ValueError as e:
+                yield start, None, str(e)
+            event = None
+        elif name == 'EXDATE':
+            event.setdefault('EXDATE', []).append((params, value))
+        else:
+            event[name] = (params, value)
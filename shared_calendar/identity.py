@@ -0,0 +1,86 @@
+"""
+Who is making a request, and which calendar it is for.
+
+The main site logs users in by storing ``{"username": ...}`` as JSON under
+the session's ``user`` key. ``username`` decodes it once per request and
+keeps the result on the request, however many times a view asks.
+
+Users open the calendars they are members of (``CalendarMembership``).
+A request names one with ``?calendar=<slug>``, or gets the user's first.
+``calendar`` looks it up once per request, and a user who is not a
+member gets None.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+
+from .models import CalendarMembership
+
+_UNSET = object()
+
+
+def _decode(session):
+    try:
+        return json.loads(session['user'])['username']
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def username(request):
+    """The logged in username, or None; the session is decoded once per request."""
+    cached = getattr(request, '_shared_calendar_username', _UNSET)
+    if cached is _UNSET:
+        cached = request._shared_calendar_username = _decode(request.session)
+    return cached
+
+
+async def ausername(request):
+    """Async version of ``username``; loading the session touches the database."""
+    cached = getattr(request, '_shared_calendar_username', _UNSET)
+    if cached is _UNSET:
+        cached = await sync_to_async(username)(request)
+    return cached
+
+
+def find_calendar(name, slug=None, calendar_id=None):
+    """
+    The calendar ``name`` is a member of with the given slug or id, or
+    their first calendar; None if there is no such membership.
+    """
+    memberships = CalendarMembership.objects.filter(username=name).select_related('calendar')
+    if slug:
+        memberships = memberships.filter(calendar__slug=slug)
+    if calendar_id is not None:
+        memberships = memberships.filter(calendar_id=calendar_id)
+    membership = memberships.order_by('id').first()
+    return None if membership is None else membership.calendar
+
+
+def calendar(request):
+    """The calendar the request is for, or None; looked up once per request."""
+    cached = getattr(request, '_shared_calendar', _UNSET)
+    if cached is _UNSET:
+        name = username(request)
+        cached = None if name is None else find_calendar(name, request.GET.get('calendar'))
+        request._shared_calendar = cached
+    return cached
+
+
+async def acalendar(request):
+    """Async version of ``calendar``."""
+    cached = getattr(request, '_shared_calendar', _UNSET)
+    if cached is _UNSET:
+        cached = await sync_to_async(calendar)(request)
+    return cached
+
+
+def members(calendar):
+    """Usernames of the members of ``calendar``, as a sorted tuple read once per instance."""
+    if not hasattr(calendar, '_member_names'):
+        calendar._member_names = tuple(sorted(calendar.memberships.values_list('username', flat=True)))
+    return calendar._member_names
+
+
+def cache_scope(calendar_id):
+    """Key identifying a calendar in the appointment cache."""
+    return f'calendar:{calendar_id}'
@@ -0,0 +1,219 @@
+"""
+Bulk appointment import from CSV and iCalendar files.
+
+The readers parse a file line by line and yield one record per appointment,
+so an upload is never held in memory whole. ``validate`` checks records a
+batch at a time and builds unsaved Appointments for ``bulk_create``;
+``import_rows`` runs the import itself, with its change feed entries and
+summary notification, for the import view and management command.
+
+CSV files have a header row naming the ``CSV_COLUMNS`` they use. ``title``,
+``date`` (YYYY-MM-DD), ``start_time`` and ``end_time`` (HH:MM) are required.
+Lists (``recurrence_days`` as weekday numbers, 0 = Monday, and
+``recurrence_exceptions`` as dates) are separated by spaces or semicolons.
+"""
+import csv
+from datetime import date, time
+from itertools import islice
+import re
+import uuid
+
+from dateutil import parser
+from django.conf import settings
+from django.db import transaction
+
+from . import appointment_api, ics
+from .models import Appointment
+from .outbox import enqueue_notification
+
+FORMATS = ('csv', 'ics')
+
+CSV_COLUMNS = (
+    'title', 'date', 'start_time', 'end_time', 'can_watch_evee', 'is_recurring',
+    'recurrence_days', 'recurrence_end', 'recurrence_exceptions'
+)
+REQUIRED_COLUMNS = ('title', 'date', 'start_time', 'end_time')
+
+TITLE_LENGTH = Appointment._meta.get_field('title').max_length
+
+
+def read_csv(lines):
+    """
+    Parse a CSV file as it is read.
+
+    Args:
+        lines (iterable): Text lines, e.g. an open file
+
+    Yields:
+        tuple: (line number, record dict, None)
+
+    Raises:
+        ValueError: The header lacks a required column
+    """
+    reader = csv.DictReader(lines)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f'Missing CSV columns: {", ".join(missing)}')
+    for record in reader:
+        yield reader.line_num, record, None
+
+
+def read(file_format, lines):
+    """Return the reader for ``file_format`` ('csv' or 'ics') over ``lines``."""
+    if file_format == 'ics':
+        return ics.read_events(lines)
+    return read_csv(lines)
+
+
+def batches(rows, size):
+    """Yield lists of up to ``size`` rows."""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return _text(value).lower() in ('1', 'true', 'yes', 'y')
+
+
+def _list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [item for item in re.split(r'[\s;,]+', _text(value)) if item]
+
+
+def _date(value, field):
+    try:
+        return date.fromisoformat(_text(value))
+    except ValueError:
+        raise ValueError(f'Invalid {field}: {value!r}. Must be in YYYY-MM-DD format.')
+
+
+def _time(value, field):
+    value = _text(value)
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        pass
+    # Exports from other tools often use 12-hour times
+    try:
+        return parser.parse(value).time()
+    except (ValueError, OverflowError):
+        raise ValueError(f'Invalid {field}: {value!r}. Must be a time such as 09:30.')
+
+
+def build(record, user, calendar):
+    """
+    Build an unsaved Appointment of ``user`` in ``calendar`` from an imported record.
+
+    Raises:
+        ValueError: The record is invalid; the message says why
+    """
+    missing = [field for field in REQUIRED_COLUMNS if not _text(record.get(field))]
+    if missing:
+        raise ValueError(f'Missing required fields: {", ".join(missing)}')
+    title = _text(record['title'])
+    if len(title) > TITLE_LENGTH:
+        raise ValueError(f'Title is longer than {TITLE_LENGTH} characters')
+
+    is_recurring = _flag(record.get('is_recurring'))
+    recurrence_days = []
+    recurrence_end = None
+    recurrence_exceptions = []
+    if is_recurring:
+        try:
+            recurrence_days = sorted({int(day) for day in _list(record.get('recurrence_days'))})
+        except ValueError:
+            recurrence_days = None
+        if recurrence_days is None or any(not 0 <= day <= 6 for day in recurrence_days):
+            raise ValueError(f"Invalid recurrence_days: {record.get('recurrence_days')!r}. Must be weekday numbers 0-6.")
+        if _text(record.get('recurrence_end')):
+            recurrence_end = _date(record['recurrence_end'], 'recurrence_end')
+        recurrence_exceptions = sorted({
+            _date(day, 'recurrence exception').isoformat() for day in _list(record.get('recurrence_exceptions'))
+        })
+
+    return Appointment(
+        calendar=calendar,
+        user=user,
+        title=title,
+        date=_date(record['date'], 'date'),
+        start_time=_time(record['start_time'], 'start_time'),
+        end_time=_time(record['end_time'], 'end_time'),
+        can_watch_evee=_flag(record.get('can_watch_evee')),
+        is_recurring=is_recurring,
+        recurrence_days=recurrence_days,
+        recurrence_end=recurrence_end,
+        recurrence_exceptions=recurrence_exceptions,
+        series_id=uuid.uuid4() if is_recurring else None,
+    )
+
+
+def validate(batch, user, calendar):
+    """
+    Validate a batch of rows from one of the readers.
+
+    Returns:
+        tuple: (list of unsaved Appointments, list of {'row', 'error'} dicts)
+    """
+    appointments = []
+    errors = []
+    for line, record, error in batch:
+        if error is None:
+            try:
+                appointments.append(build(record, user, calendar))
+                continue
+            except ValueError as e:
+                error = str(e)
+        errors.append({'row': line, 'error': error})
+    return appointments, errors
+
+
+def import_rows(rows, username, calendar, dry_run=False, skip_invalid=False):
+    """
+    Import rows from one of the readers into ``calendar``, validating and
+    inserting them in batches of ``SHARED_CALENDAR_BULK_BATCH_SIZE`` in one
+    transaction. Nothing is written if any row is invalid, unless
+    ``skip_invalid`` is set, or on a dry run. One notification summarizes
+    the import.
+
+    Returns:
+        dict: ``rows`` read, ``valid`` rows, appointments ``created``, the
+        per-row ``errors`` and whether it was a ``dry_run``
+    """
+    batch_size = getattr(settings, 'SHARED_CALENDAR_BULK_BATCH_SIZE', 500)
+    summary = {'rows': 0, 'valid': 0, 'created': 0, 'errors': [], 'dry_run': dry_run}
+    with transaction.atomic():
+        for batch in batches(rows, batch_size):
+            appointments, errors = validate(batch, username, calendar)
+            summary['rows'] += len(batch)
+            summary['valid'] += len(appointments)
+            summary['errors'].extend(errors)
+            # Once the import is bound to be rolled back, only validate the rest
+            if dry_run or (summary['errors'] and not skip_invalid) or not appointments:
+                continue
+            Appointment.objects.bulk_create(appointments)
+            appointment_api.record_write([], [appointment_api.row(appointment) for appointment in appointments])
+            summary['created'] += len(appointments)
+
+        if dry_run or (summary['errors'] and not skip_invalid):
+            transaction.set_rollback(True)
+            summary['created'] = 0
+        elif summary['created']:
+            enqueue_notification(
+                title="Appointments Imported",
+                body=f"{username} imported {summary['created']} appointments",
+                data={
+                    'type': 'appointments_imported',
+                    'count': str(summary['created']),
+                    'user': username
+                },
+                calendar=calendar
+            )
+    return summary
@@ -0,0 +1,114 @@
+from importlib import metadata
+import json
+import platform
+import random
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from shared_calendar import identity, notifications
+from shared_calendar.benchmarks import pushstub
+from shared_calendar.benchmarks.scenarios import SCENARIOS, client
+from shared_calendar.benchmarks.seed import USERS, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the calendar API and notification fan-out on a throwaway test database '
+        'and print the results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calendars', type=int, default=1,
+                            help='Calendars to seed; the scenarios use the first, the rest add other tenants\' rows')
+        parser.add_argument('--one-off', type=int, default=2000, help='One-off appointments to seed per calendar')
+        parser.add_argument('--recurring', type=int, default=200, help='Recurring series to seed per calendar')
+        parser.add_argument('--subscriptions', type=int, default=50, help='Push subscriptions to seed')
+        parser.add_argument('--days', type=int, default=365, help='Days the seeded appointments are spread over')
+        parser.add_argument('--iterations', type=int, default=200, help='Operations per scenario')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+                            help='Scenario to run; repeat for several. All run by default')
+        parser.add_argument('--push-latency', type=float, default=0,
+                            help='Milliseconds the stub push service takes to answer')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible data')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        if options['calendars'] < 1:
+            raise CommandError('--calendars must be at least 1')
+        names = options['scenarios'] or list(SCENARIOS)
+        rng = random.Random(options['seed'])
+
+        # Everything runs against a test database and a private cache, so
+        # the benchmark never touches real appointments or cached days
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with pushstub.PushServer(options['push_latency'] / 1000) as push_server, override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                CACHES={**settings.CACHES, 'shared_calendar_benchmark': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'shared-calendar-benchmark',
+                }},
+                SHARED_CALENDAR_CACHE='shared_calendar_benchmark',
+                SHARED_CALENDAR_PUSH_REQUIRE_FIREBASE=False,
+                WEBPUSH_SETTINGS={
+                    'VAPID_PRIVATE_KEY': pushstub.vapid_private_key(),
+                    'VAPID_ADMIN_EMAIL': 'benchmark@localhost',
+                },
+            ):
+                # Sign with the stub key rather than one parsed before
+                notifications._vapid_key = None
+                seeded = seed(
+                    USERS, one_off=options['one_off'], recurring=options['recurring'],
+                    subscriptions=options['subscriptions'], days=options['days'],
+                    push_url=push_server.url, rng=rng, calendars=options['calendars']
+                )
+                context = {
+                    'calendar': identity.find_calendar(USERS[0]),
+                    'clients': {username: client(username) for username in USERS},
+                    'users': USERS,
+                    'days': options['days'],
+                    'push_server': push_server,
+                    'rng': rng,
+                }
+                results = []
+                for name in names:
+                    self.stderr.write(f'Running {name}')
+                    results.append(SCENARIOS[name](context, options['iterations']))
+        finally:
+            notifications._vapid_key = None
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        try:
+            version = metadata.version('django-shared-calendar')
+        except metadata.PackageNotFoundError:
+            version = None
+        report = {
+            'environment': {
+                'shared_calendar': version,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+            },
+            'options': {
+                key: options[key]
+                for key in (
+                    'calendars', 'one_off', 'recurring', 'subscriptions', 'days', 'iterations', 'push_latency', 'seed'
+                )
+            },
+            'seeded': seeded,
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
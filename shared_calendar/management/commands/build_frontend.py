@@ -0,0 +1,56 @@
+from pathlib import Path
+import shlex
+import subprocess
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from shared_calendar.templatetags.shared_calendar import BUNDLE, SOURCE
+
+STATIC_DIR = Path(__file__).resolve().parents[2] / 'static'
+
+
+class Command(BaseCommand):
+    help = 'Transpile and minify the calendar front end into the static bundle {% calendar_scripts %} loads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--esbuild',
+                            help='Command that runs esbuild; defaults to SHARED_CALENDAR_ESBUILD '
+                                 'or "npx --yes esbuild"')
+        parser.add_argument('--target', default='es2017', help='Oldest JavaScript version to emit')
+        parser.add_argument('--collectstatic', action='store_true',
+                            help='Run collectstatic afterwards, fingerprinting the bundle')
+
+    def handle(self, *args, **options):
+        esbuild = options['esbuild'] or getattr(settings, 'SHARED_CALENDAR_ESBUILD', 'npx --yes esbuild')
+        source = STATIC_DIR / SOURCE
+        output = STATIC_DIR / BUNDLE
+        # The app uses the React and ReactDOM globals, so JSX is compiled to
+        # React.createElement calls and React itself is not bundled
+        command = [
+            *shlex.split(esbuild), str(source),
+            '--loader:.js=jsx',
+            '--minify',
+            f"--target={options['target']}",
+            '--legal-comments=none',
+            f'--outfile={output}',
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True)
+        except OSError as e:
+            raise CommandError(f'Could not run esbuild ({esbuild}): {e}. Install Node.js or pass --esbuild.')
+        if result.returncode:
+            raise CommandError(f'esbuild failed:\n{result.stderr}')
+
+        self.stdout.write(
+            f'Built {output} ({output.stat().st_size / 1024:.0f} KB from {source.stat().st_size / 1024:.0f} KB)'
+        )
+        if not isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+            self.stderr.write(
+                'The static files storage does not fingerprint files; use ManifestStaticFilesStorage '
+                'so the bundle can be cached for a year'
+            )
+        if options['collectstatic']:
+            call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Only imported once a notification is actually sent
+DEFERRED_MODULES = ('firebase_admin', 'pywebpush', 'py_vapid', 'requests')
+
+
+class Command(BaseCommand):
+    help = 'Measure how long importing shared_calendar.views takes in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float,
+                            help='Milliseconds allowed; defaults to SHARED_CALENDAR_IMPORT_BUDGET_MS')
+        parser.add_argument('--module', default='shared_calendar.views', help='Module to measure')
+
+    def handle(self, *args, **options):
+        budget = options['budget']
+        if budget is None:
+            budget = getattr(settings, 'SHARED_CALENDAR_IMPORT_BUDGET_MS', 100)
+        module = options['module']
+
+        # Set Django up first so only the module's own imports are timed
+        code = f'import django; django.setup(); import {module}'
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, env=os.environ.copy()
+        )
+        if result.returncode:
+            raise CommandError(f'Importing {module} failed:\n{result.stderr}')
+
+        # Lines look like "import time: self [us] | cumulative | imported package"
+        cumulative = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, total, name = line[len('import time:'):].split('|')
+            if total.strip().isdigit():
+                cumulative[name.strip()] = int(total) / 1000
+        if module not in cumulative:
+            raise CommandError(f'{module} was already imported during Django setup')
+
+        elapsed = cumulative[module]
+        self.stdout.write(f'{module}: {elapsed:.1f} ms (budget {budget:.0f} ms)')
+        deferred = [name for name in DEFERRED_MODULES if name in cumulative]
+        if deferred:
+            raise CommandError(f'{module} imports {", ".join(deferred)}, which should load on first send')
+        if elapsed > budget:
+            raise CommandError(f'{module} took {elapsed:.1f} ms to import, over the {budget:.0f} ms budget')
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shared_calendar import identity, importer
+
+
+class Command(BaseCommand):
+    help = 'Import appointments for a user from a CSV or iCalendar (.ics) file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--user', required=True, help='Username the appointments belong to')
+        parser.add_argument('--calendar',
+                            help="Slug of the calendar to import into; the user's first calendar by default")
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='File format; taken from the file extension by default')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the file and report errors without importing anything')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Import the valid rows even if some rows have errors')
+
+    def handle(self, *args, **options):
+        calendar = identity.find_calendar(options['user'], options['calendar'])
+        if calendar is None:
+            raise CommandError(f"{options['user']} is not a member of {options['calendar'] or 'any calendar'}")
+
+        file_format = options['format'] or ('ics' if options['path'].lower().endswith('.ics') else 'csv')
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+                summary = importer.import_rows(
+                    importer.read(file_format, lines), options['user'], calendar,
+                    dry_run=options['dry_run'], skip_invalid=options['skip_invalid']
+                )
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        for error in summary['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        if summary['dry_run']:
+            self.stdout.write(f"Dry run: {summary['valid']} of {summary['rows']} rows are valid")
+        elif summary['errors'] and not options['skip_invalid']:
+            raise CommandError(
+                f"{len(summary['errors'])} of {summary['rows']} rows are invalid; nothing was imported. "
+                'Fix them or pass --skip-invalid.'
+            )
+        else:
+            self.stdout.write(f"Imported {summary['created']} of {summary['rows']} appointments")
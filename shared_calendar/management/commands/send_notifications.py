@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shared_calendar import notifications
+from shared_calendar.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Push queued calendar notifications to subscribers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the outbox once and exit instead of polling')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--batch-size', type=int, help='Notifications taken per batch')
+        parser.add_argument('--workers', type=int, help='Most pushes in flight at once')
+        parser.add_argument('--timeout', type=float, help='Seconds to wait for each push service')
+        parser.add_argument('--max-attempts', type=int, help='Attempts before giving up on a notification')
+        parser.add_argument('--backoff', type=float, help='Seconds before the first retry, doubled each time')
+
+    def handle(self, *args, **options):
+        if not notifications.push_enabled():
+            self.stderr.write('Firebase not initialized; notifications stay queued until it is')
+
+        while True:
+            processed = process_outbox(
+                batch_size=options['batch_size'],
+                max_workers=options['workers'],
+                timeout=options['timeout'],
+                max_attempts=options['max_attempts'],
+                backoff=options['backoff'],
+            )
+            if processed:
+                self.stdout.write(f'Processed {processed} notifications')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+from shared_calendar.recurrence import weekday_mask
+
+
+def backfill_recurrence_mask(apps, schema_editor):
+    Appointment = apps.get_model('shared_calendar', 'Appointment')
+    for appointment in Appointment.objects.filter(is_recurring=True).only('id', 'recurrence_days'):
+        Appointment.objects.filter(id=appointment.id).update(
+            recurrence_mask=weekday_mask(appointment.recurrence_days)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='recurrence_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_recurrence_mask, migrations.RunPython.noop),
+    ]
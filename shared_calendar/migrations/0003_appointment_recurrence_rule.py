@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def collapse_recurring_instances(apps, schema_editor):
+    """
+    Recurring appointments used to be stored as one row per occurrence for
+    the next six months. Keep the earliest row of each such series as its
+    rule and delete the copies, which would otherwise each start a series.
+    """
+    Appointment = apps.get_model('shared_calendar', 'Appointment')
+    rules = {}
+    duplicates = []
+    recurring = Appointment.objects.filter(is_recurring=True).order_by('date', 'id').values_list(
+        'id', 'user', 'title', 'start_time', 'end_time', 'can_watch_evee', 'recurrence_mask'
+    )
+    for appointment_id, *series in recurring.iterator():
+        if tuple(series) in rules:
+            duplicates.append(appointment_id)
+        else:
+            rules[tuple(series)] = appointment_id
+    for offset in range(0, len(duplicates), 500):
+        Appointment.objects.filter(id__in=duplicates[offset:offset + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0002_appointment_recurrence_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='recurrence_end',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='recurrence_exceptions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(collapse_recurring_instances, migrations.RunPython.noop),
+    ]
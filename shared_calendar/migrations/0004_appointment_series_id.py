@@ -0,0 +1,25 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def backfill_series_id(apps, schema_editor):
+    Appointment = apps.get_model('shared_calendar', 'Appointment')
+    for appointment_id in Appointment.objects.filter(is_recurring=True).values_list('id', flat=True).iterator():
+        Appointment.objects.filter(id=appointment_id).update(series_id=uuid.uuid4())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0003_appointment_recurrence_rule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='series_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_series_id, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0007_appointmentchange'),
+    ]
+
+    operations = [
+        # Superseded by appointment_recurring_idx
+        migrations.AlterField(
+            model_name='appointment',
+            name='recurrence_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', 'date'], name='shared_cale_user_2b03cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('is_recurring', True)), fields=['user', 'recurrence_mask', 'date'], name='appointment_recurring_idx'),
+        ),
+    ]
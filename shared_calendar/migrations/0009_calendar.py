@@ -0,0 +1,54 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0008_appointment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Calendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CalendarMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='shared_calendar.calendar')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['username'], name='calendar_membership_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('calendar', 'username'), name='calendar_membership_unique')],
+            },
+        ),
+        # Nullable until 0010 has put the existing appointments in a calendar
+        migrations.AddField(
+            model_name='appointment',
+            name='calendar',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='shared_calendar.calendar'),
+        ),
+        migrations.AddField(
+            model_name='appointmentchange',
+            name='calendar',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='shared_calendar.calendar'),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='calendar',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='shared_calendar.calendar'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentchange',
+            index=models.Index(fields=['calendar', 'id'], name='appointmentchange_calendar_idx'),
+        ),
+    ]
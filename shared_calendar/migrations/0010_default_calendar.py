@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import migrations
+
+# identity.DEFAULT_USERS when this migration was written
+DEFAULT_USERS = ('a.westermann.19', 'Ash')
+
+
+def create_default_calendar(apps, schema_editor):
+    """
+    Put the existing appointments and change feed entries in a calendar
+    shared by the users the settings named before calendars existed.
+    """
+    Calendar = apps.get_model('shared_calendar', 'Calendar')
+    CalendarMembership = apps.get_model('shared_calendar', 'CalendarMembership')
+    Appointment = apps.get_model('shared_calendar', 'Appointment')
+    AppointmentChange = apps.get_model('shared_calendar', 'AppointmentChange')
+
+    users = set(getattr(settings, 'SHARED_CALENDAR_USERS', DEFAULT_USERS))
+    users.update(getattr(settings, 'SHARED_CALENDAR_ALLOWED_USERS', None) or ())
+    calendar, _ = Calendar.objects.get_or_create(slug='shared', defaults={'name': 'Shared Calendar'})
+    CalendarMembership.objects.bulk_create(
+        [CalendarMembership(calendar=calendar, username=username) for username in sorted(users)],
+        ignore_conflicts=True
+    )
+    Appointment.objects.filter(calendar__isnull=True).update(calendar=calendar)
+    AppointmentChange.objects.filter(calendar__isnull=True).update(calendar=calendar)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0009_calendar'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_calendar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0010_default_calendar'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='calendar',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='shared_calendar.calendar'),
+        ),
+        # Reads are scoped to a calendar rather than a list of users
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='shared_cale_user_2b03cf_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_recurring_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['calendar', 'date'], name='appointment_calendar_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('is_recurring', True)), fields=['calendar', 'recurrence_mask', 'date'], name='appointment_calendar_rec_idx'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+import django.contrib.auth.models
+import django.contrib.auth.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models, router
+
+
+def create_missing_tables(apps, schema_editor):
+    """
+    Create the User and PushSubscription tables, and the subscription
+    indexes, unless they exist already. Earlier versions shipped these models
+    without a migration, so sites that have run them created the tables
+    from their own project's migrations.
+    """
+    connection = schema_editor.connection
+    for name in ('User', 'PushSubscription'):
+        model = apps.get_model('shared_calendar', name)
+        if model._meta.swapped or not router.allow_migrate_model(connection.alias, model):
+            continue
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+            if model._meta.db_table not in tables:
+                schema_editor.create_model(model)
+                continue
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        for field in model._meta.local_many_to_many:
+            if field.remote_field.through._meta.db_table not in tables:
+                schema_editor.create_model(field.remote_field.through)
+        for index in model._meta.indexes:
+            if index.name not in constraints:
+                schema_editor.add_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('shared_calendar', '0011_appointment_calendar_indexes'),
+    ]
+
+    operations = [
+        # Catch the migration state up with models.py; neither changes the schema
+        migrations.AlterField(
+            model_name='appointment',
+            name='recurrence_days',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterModelTable(
+            name='appointment',
+            table='shared_calendar_appointment',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='User',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('password', models.CharField(max_length=128, verbose_name='password')),
+                        ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                        ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                        ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                        ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                        ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                        ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                        ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                        ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                        ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                        ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                        ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+                    ],
+                    options={
+                        'swappable': 'AUTH_USER_MODEL',
+                    },
+                    managers=[
+                        ('objects', django.contrib.auth.models.UserManager()),
+                    ],
+                ),
+                migrations.CreateModel(
+                    name='PushSubscription',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('subscription_info', models.JSONField()),
+                        ('active', models.BooleanField(default=True)),
+                        ('created_at', models.DateTimeField(auto_now_add=True)),
+                        ('updated_at', models.DateTimeField(auto_now=True)),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'indexes': [
+                            models.Index(fields=['active'], name='shared_cale_active_f0fccc_idx'),
+                            models.Index(fields=['user', 'active'], name='shared_cale_user_id_a57433_idx'),
+                        ],
+                    },
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.RunPython(create_missing_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_calendar', '0012_user_pushsubscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='push_timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from datetime import timedelta
+from .recurrence import weekday_mask, masks_containing
 
 
 class User(AbstractUser):
@@ -11,22 +15,144 @@ class User(AbstractUser):
         return self.first_name
 
 
+class Calendar(models.Model):
+    """A calendar shared by its members; every appointment belongs to one."""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class CalendarMembership(models.Model):
+    # Usernames as the main site's session carries them, like Appointment.user
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, related_name='memberships')
+    username = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Members are listed per calendar and calendars looked up per user
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'username'], name='calendar_membership_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['username'], name='calendar_membership_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.username} in {self.calendar}"
+
+
+class AppointmentQuerySet(models.QuerySet):
+    def in_range(self, start, end):
+        """
+        Appointments that may occur between ``start`` and ``end``: those dated
+        in the range plus recurring series that are running during it and
+        repeat on one of its weekdays. Expand them with
+        ``recurrence.iter_occurrences``, which also applies exceptions.
+        """
+        weekdays = {(start + timedelta(days=offset)).weekday() for offset in range(min((end - start).days + 1, 7))}
+        masks = sorted({mask for day in weekdays for mask in masks_containing(day)})
+        return self.filter(
+            models.Q(date__range=(start, end)) |
+            models.Q(is_recurring=True, recurrence_mask__in=masks, date__lte=end) & (
+                models.Q(recurrence_end__isnull=True) | models.Q(recurrence_end__gte=start)
+            )
+        )
+
+    def bulk_create(self, objs, batch_size=None, **kwargs):
+        """
+        Insert appointments in batches of ``SHARED_CALENDAR_BULK_BATCH_SIZE``
+        (500 by default). ``save()`` is not called for bulk inserts, so the
+        recurrence bitmask is synced here.
+        """
+        objs = list(objs)
+        for appointment in objs:
+            appointment.sync_recurrence_mask()
+        if batch_size is None:
+            batch_size = getattr(settings, 'SHARED_CALENDAR_BULK_BATCH_SIZE', 500)
+        return super().bulk_create(objs, batch_size=batch_size, **kwargs)
+
+
 class Appointment(models.Model):
+    # Indexed by the calendar-first indexes in Meta
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, db_index=False)
     user = models.CharField(max_length=100)
     title = models.CharField(max_length=200)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     start_time = models.TimeField()
     end_time = models.TimeField()
     can_watch_evee = models.BooleanField(default=False)
     is_recurring = models.BooleanField(default=False)
     recurrence_days = models.JSONField(default=list, blank=True)
+    # Recurring rows are the rule for their whole series; see recurrence.py
+    recurrence_end = models.DateField(null=True, blank=True)
+    recurrence_exceptions = models.JSONField(default=list, blank=True)
+    # Bitmask of recurrence_days, kept in sync on save; see recurrence.py
+    recurrence_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Shared by every row of a recurring series; see series.py
+    series_id = models.UUIDField(null=True, blank=True, db_index=True)
+    # Bumped on every write, including set-based updates in series.py
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = AppointmentQuerySet.as_manager()
 
     class Meta:
         db_table = 'shared_calendar_appointment'
+        # Match the two halves of AppointmentQuerySet.in_range within one
+        # calendar: rows dated in the range, and recurring rules by weekday mask
+        indexes = [
+            models.Index(fields=['calendar', 'date'], name='appointment_calendar_date_idx'),
+            models.Index(
+                fields=['calendar', 'recurrence_mask', 'date'],
+                condition=models.Q(is_recurring=True),
+                name='appointment_calendar_rec_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} on {self.date} from {self.start_time} to {self.end_time}"
 
+    def sync_recurrence_mask(self):
+        self.recurrence_mask = weekday_mask(self.recurrence_days) if self.is_recurring else 0
+
+    def save(self, *args, **kwargs):
+        self.sync_recurrence_mask()
+        super().save(*args, **kwargs)
+
+
+class AppointmentChange(models.Model):
+    """An entry in the append-only feed of appointment writes; see changes.py."""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Null for entries written before calendars existed
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    # Not a foreign key: entries outlive the appointments they describe
+    appointment_id = models.BigIntegerField()
+    series_id = models.UUIDField(null=True, blank=True)
+    user = models.CharField(max_length=100)
+    # The appointment as the read APIs return it; null when deleted
+    data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Each calendar reads its own entries after a cursor
+        indexes = [
+            models.Index(fields=['calendar', 'id'], name='appointmentchange_calendar_idx'),
+        ]
+
+    def __str__(self):
+        return f"Appointment {self.appointment_id} {self.action}"
+
 
 class PushSubscription(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -35,5 +161,48 @@ class PushSubscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Sends read the active subscriptions; unsubscribing filters by user
+        indexes = [
+            models.Index(fields=['active']),
+            models.Index(fields=['user', 'active']),
+        ]
+
     def __str__(self):
         return f"Push subscription for {self.user.username}"
+
+
+class NotificationOutbox(models.Model):
+    """A notification waiting to be pushed by the send_notifications worker."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    # Only this calendar's members are notified; null notifies every subscriber
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Subscription ids still to deliver to on retry; null means every active one
+    pending_subscriptions = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Push time histograms per push service over every attempt, with SHARED_CALENDAR_PERF on
+    push_timings = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.status})"
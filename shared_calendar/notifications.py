@@ -1,63 +1,218 @@
-import firebase_admin
-from firebase_admin import credentials, messaging
+"""
+Push notification delivery.
+
+Nothing heavy is imported with this module: Firebase is initialized and
+``firebase_admin``, ``pywebpush`` and ``requests`` are imported on the first
+send, so processes that never notify (management commands, tests, web
+workers that only queue to the outbox) do not pay for them.
+"""
 import os
 from django.conf import settings
-from pywebpush import webpush, WebPushException
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 import json
+import logging
+import threading
+import time
+
+from . import perf
+
+logger = logging.getLogger(__name__)
+
+# Push services expire subscriptions with one of these statuses
+EXPIRED_STATUS_CODES = (404, 410)
+
+# One pooled HTTP session per push service origin, shared across threads, so
+# repeat notifications reuse open TLS connections
+_sessions = {}
+_vapid_key = None
+_lock = threading.Lock()
+
+# None until the first send tries to initialize Firebase
+_firebase_initialized = None
+_firebase_lock = threading.Lock()
+
+
+def firebase_initialized():
+    """
+    Initialize the Firebase Admin SDK on first use, once per process.
+
+    Returns:
+        bool: Whether Firebase is available; sends are skipped when it is not
+    """
+    global _firebase_initialized
+    if _firebase_initialized is None:
+        with _firebase_lock:
+            if _firebase_initialized is None:
+                import firebase_admin
+                from firebase_admin import credentials
+                try:
+                    cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), 'firebase-credentials.json'))
+                    firebase_admin.initialize_app(cred)
+                    _firebase_initialized = True
+                except (FileNotFoundError, ValueError) as e:
+                    logger.warning("Firebase initialization failed, continuing without it: %s", e)
+                    _firebase_initialized = False
+    return _firebase_initialized
 
-# Initialize Firebase Admin SDK with error handling
-firebase_initialized = False
-try:
-    cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), 'firebase-credentials.json'))
-    firebase_admin.initialize_app(cred)
-    firebase_initialized = True
-except (FileNotFoundError, ValueError) as e:
-    print(f"Firebase initialization failed: {str(e)}")
-    print("Server will continue running without Firebase functionality")
-
-def send_web_push(subscription_info, message_body):
+
+def push_enabled():
+    """
+    Whether notifications can be sent: once Firebase is initialized, or
+    always with ``SHARED_CALENDAR_PUSH_REQUIRE_FIREBASE = False``, as web
+    pushes only need the VAPID key.
+    """
+    if not getattr(settings, 'SHARED_CALENDAR_PUSH_REQUIRE_FIREBASE', True):
+        return True
+    return firebase_initialized()
+
+
+def _session_for(endpoint):
+    origin = '{0.scheme}://{0.netloc}'.format(urlsplit(endpoint))
+    session = _sessions.get(origin)
+    if session is None:
+        with _lock:
+            session = _sessions.get(origin)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                pool_size = getattr(settings, 'SHARED_CALENDAR_PUSH_WORKERS', 8)
+                session = requests.Session()
+                session.mount(origin, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+                _sessions[origin] = session
+    return session
+
+
+def _vapid():
+    """The VAPID signing key, parsed once rather than for every push."""
+    global _vapid_key
+    if _vapid_key is None:
+        with _lock:
+            if _vapid_key is None:
+                from py_vapid import Vapid
+
+                _vapid_key = Vapid.from_string(private_key=settings.WEBPUSH_SETTINGS['VAPID_PRIVATE_KEY'])
+    return _vapid_key
+
+
+def send_web_push(subscription_info, message_body, timeout=None):
     """
     Send a web push notification to a specific subscription.
     
     Args:
         subscription_info (dict): The subscription information from the client
         message_body (dict): The message to send, including title and body
+        timeout (float): Seconds to wait for the push service, or None
+
+    Returns:
+        dict: ``success``, the push service's ``status_code`` (None if it
+        could not be reached) and ``error`` (None on success)
     """
-    if not firebase_initialized:
-        print("Web push notification skipped: Firebase not initialized")
-        return False
+    if not push_enabled():
+        logger.debug("Web push notification skipped: Firebase not initialized")
+        return {'success': False, 'status_code': None, 'error': 'Firebase not initialized'}
+
+    from pywebpush import webpush, WebPushException
         
     try:
-        webpush(
+        response = webpush(
             subscription_info=subscription_info,
             data=json.dumps(message_body),
-            vapid_private_key=settings.WEBPUSH_SETTINGS['VAPID_PRIVATE_KEY'],
+            vapid_private_key=_vapid(),
             vapid_claims={
                 "sub": f"mailto:{settings.WEBPUSH_SETTINGS['VAPID_ADMIN_EMAIL']}"
-            }
+            },
+            timeout=timeout,
+            requests_session=_session_for(subscription_info['endpoint'])
         )
-        return True
+        return {'success': True, 'status_code': response.status_code, 'error': None}
     except WebPushException as e:
-        print(f"Web push failed: {str(e)}")
-        return False
+        status_code = e.response.status_code if e.response is not None else None
+        logger.warning("Web push failed: %s", e, extra={'status_code': status_code})
+        return {'success': False, 'status_code': status_code, 'error': str(e)}
     except Exception as e:
-        print(f"Unexpected error in web push: {str(e)}")
-        return False
+        logger.exception("Unexpected error in web push")
+        return {'success': False, 'status_code': None, 'error': str(e)}
+
+def _timed_push(subscription_info, message, timeout):
+    """``send_web_push``, adding the push service and how long it took to the result."""
+    started = time.perf_counter()
+    result = send_web_push(subscription_info, message, timeout)
+    result['duration_ms'] = (time.perf_counter() - started) * 1000
+    result['origin'] = urlsplit(subscription_info['endpoint']).netloc
+    return result
 
-def send_notification(title, body, data=None):
+def push_to_subscriptions(subscriptions, message, timeout=None, max_workers=None):
     """
-    Send a notification to all subscribed users.
+    Send a message to several subscriptions concurrently.
+
+    Subscriptions the push service reports as expired (404/410) are marked
+    inactive so they are not tried again.
+
+    Args:
+        subscriptions (iterable): PushSubscription instances
+        message (dict): The message to send, including title and body
+        timeout (float): Seconds to wait for each push service, or None
+        max_workers (int): Most pushes in flight at once; defaults to
+            ``SHARED_CALENDAR_PUSH_WORKERS``
+
+    Returns:
+        dict: Subscription id -> result from ``send_web_push``, with an
+        added ``expired`` flag, the push service's ``origin`` and the push's
+        ``duration_ms``
+    """
+    from .models import PushSubscription
+
+    subscriptions = list(subscriptions)
+    if not subscriptions:
+        return {}
+    if max_workers is None:
+        max_workers = getattr(settings, 'SHARED_CALENDAR_PUSH_WORKERS', 8)
+
+    started = time.perf_counter()
+    with perf.span('push'), ThreadPoolExecutor(max_workers=min(max_workers, len(subscriptions))) as pool:
+        futures = {
+            subscription.id: pool.submit(_timed_push, subscription.subscription_info, message, timeout)
+            for subscription in subscriptions
+        }
+        results = {subscription_id: future.result() for subscription_id, future in futures.items()}
+
+    expired = []
+    for subscription_id, result in results.items():
+        result['expired'] = result['status_code'] in EXPIRED_STATUS_CODES
+        if result['expired']:
+            expired.append(subscription_id)
+    if expired:
+        PushSubscription.objects.filter(id__in=expired).update(active=False)
+    logger.info("Pushed %r to %d subscriptions", message['title'], len(results), extra={
+        'rows': len(results),
+        'failed': sum(1 for result in results.values() if not result['success']),
+        'expired': len(expired),
+        'slowest_ms': max(result['duration_ms'] for result in results.values()),
+        'duration_ms': (time.perf_counter() - started) * 1000,
+    })
+    return results
+
+def send_notification(title, body, data=None, calendar=None):
+    """
+    Send a notification to all subscribed users, or only to the members of
+    ``calendar`` if one is given.
     
     Args:
         title (str): Notification title
         body (str): Notification body
         data (dict): Additional data to send with the notification
+        calendar: A Calendar or its id
+
+    Returns:
+        dict: Subscription id -> delivery result, see ``push_to_subscriptions``
     """
-    if not firebase_initialized:
-        print(f"Notification '{title}' skipped: Firebase not initialized")
-        return 0
+    if not push_enabled():
+        logger.info("Notification %r skipped: Firebase not initialized", title)
+        return {}
         
-    from .models import PushSubscription
+    from .outbox import subscriptions_for
     
     message = {
         'title': title,
@@ -66,15 +221,7 @@ def send_notification(title, body, data=None):
     }
     
     try:
-        # Get all active subscriptions
-        subscriptions = PushSubscription.objects.filter(active=True)
-        
-        success_count = 0
-        for subscription in subscriptions:
-            if send_web_push(subscription.subscription_info, message):
-                success_count += 1
-        
-        return success_count
-    except Exception as e:
-        print(f"Error sending notifications: {str(e)}")
-        return 0 
\ No newline at end of file
+        return push_to_subscriptions(subscriptions_for(getattr(calendar, 'id', calendar)), message)
+    except Exception:
+        logger.exception("Error sending notifications")
+        return {}
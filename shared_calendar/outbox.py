@@ -0,0 +1,159 @@
+"""
+Notification outbox.
+
+Views queue notifications with ``enqueue_notification`` and return straight
+away; the ``send_notifications`` management command drains the queue with
+``process_outbox``, pushing each notification to its subscribers concurrently
+and retrying failed deliveries with exponential backoff. A notification
+about a calendar goes only to the subscriptions of that calendar's members.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import notifications, perf
+from .models import CalendarMembership, NotificationOutbox, PushSubscription
+
+# Most recent notifications whose push timings the metrics endpoint reports
+PUSH_METRICS_ROWS = 1000
+
+
+def enqueue_notification(title, body, data=None, calendar=None):
+    """
+    Queue a notification for the members of ``calendar``, a Calendar or its
+    id, or for every subscribed user if it is None.
+
+    Takes the same arguments as ``notifications.send_notification``.
+
+    Returns:
+        NotificationOutbox: The queued notification
+    """
+    calendar_id = getattr(calendar, 'id', calendar)
+    with perf.span('notify'):
+        return NotificationOutbox.objects.create(title=title, body=body, data=data or {}, calendar_id=calendar_id)
+
+
+def subscriptions_for(calendar_id):
+    """Active subscriptions of the members of a calendar, or every active one if ``calendar_id`` is None."""
+    subscriptions = PushSubscription.objects.filter(active=True)
+    if calendar_id is not None:
+        subscriptions = subscriptions.filter(user__username__in=(
+            CalendarMembership.objects.filter(calendar_id=calendar_id).values('username')
+        ))
+    return subscriptions
+
+
+def push_metrics(limit=PUSH_METRICS_ROWS):
+    """
+    Histograms of push time per push service over the ``limit`` most
+    recently queued notifications, recorded by the worker that delivered
+    them; see ``perf.observe_pushes``.
+    """
+    rows = (
+        NotificationOutbox.objects.filter(push_timings__isnull=False)
+        .order_by('-id').values_list('push_timings', flat=True)[:limit]
+    )
+    return perf.push_snapshot(rows)
+
+
+def _claim(batch_size, lease):
+    """
+    Take up to ``batch_size`` due notifications, hiding them from other
+    workers for ``lease``. A worker that dies mid-batch loses its claim once
+    the lease runs out and the notifications are picked up again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=NotificationOutbox.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        NotificationOutbox.objects.filter(id__in=[item.id for item in batch]).update(
+            next_attempt_at=now + lease
+        )
+    return batch
+
+
+def _finish(item, failed, max_attempts, backoff):
+    """Record the outcome of one delivery attempt and schedule a retry if needed."""
+    item.attempts += 1
+    if not failed:
+        item.status = NotificationOutbox.SENT
+        item.sent_at = timezone.now()
+        item.pending_subscriptions = None
+        item.last_error = ''
+    elif item.attempts >= max_attempts:
+        item.status = NotificationOutbox.FAILED
+        item.pending_subscriptions = failed
+        item.last_error = f'{len(failed)} deliveries failed after {item.attempts} attempts'
+    else:
+        item.pending_subscriptions = failed
+        item.next_attempt_at = timezone.now() + timedelta(seconds=backoff * 2 ** (item.attempts - 1))
+        item.last_error = f'{len(failed)} deliveries failed'
+    item.save(update_fields=[
+        'status', 'attempts', 'next_attempt_at', 'pending_subscriptions', 'last_error', 'sent_at', 'push_timings'
+    ])
+
+
+def process_outbox(batch_size=None, max_workers=None, timeout=None, max_attempts=None, backoff=None):
+    """
+    Deliver one batch of due notifications.
+
+    Arguments default to the ``SHARED_CALENDAR_PUSH_*`` settings.
+
+    Args:
+        batch_size (int): Most notifications to take from the outbox
+        max_workers (int): Most pushes in flight at once
+        timeout (float): Seconds to wait for each push service response
+        max_attempts (int): Attempts before a notification is marked failed
+        backoff (float): Seconds before the first retry, doubled each time
+
+    Returns:
+        int: Number of notifications processed
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'SHARED_CALENDAR_PUSH_BATCH_SIZE', 50)
+    if max_workers is None:
+        max_workers = getattr(settings, 'SHARED_CALENDAR_PUSH_WORKERS', 8)
+    if timeout is None:
+        timeout = getattr(settings, 'SHARED_CALENDAR_PUSH_TIMEOUT', 10)
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'SHARED_CALENDAR_PUSH_MAX_ATTEMPTS', 5)
+    if backoff is None:
+        backoff = getattr(settings, 'SHARED_CALENDAR_PUSH_RETRY_BACKOFF', 30)
+
+    # Leave notifications queued until push is configured, as send_notification skips them
+    if not notifications.push_enabled():
+        return 0
+
+    # Claim for long enough to push the whole batch one notification at a time
+    batch = _claim(batch_size, lease=timedelta(seconds=timeout * batch_size + 60))
+    if not batch:
+        return 0
+
+    # Subscriptions loaded for the batch, and the ids of each calendar's
+    subscriptions = {}
+    audiences = {}
+    for item in batch:
+        if item.calendar_id not in audiences:
+            loaded = {subscription.id: subscription for subscription in subscriptions_for(item.calendar_id)}
+            subscriptions.update(loaded)
+            audiences[item.calendar_id] = list(loaded)
+        message = {'title': item.title, 'body': item.body, 'data': item.data}
+        targets = audiences[item.calendar_id] if item.pending_subscriptions is None else item.pending_subscriptions
+        results = notifications.push_to_subscriptions(
+            [subscriptions[subscription_id] for subscription_id in targets if subscription_id in subscriptions],
+            message, timeout=timeout, max_workers=max_workers
+        )
+        failed = []
+        for subscription_id, result in results.items():
+            if result['expired']:
+                subscriptions.pop(subscription_id, None)
+            elif not result['success']:
+                failed.append(subscription_id)
+        item.push_timings = perf.observe_pushes(item.push_timings, results)
+        _finish(item, failed, max_attempts, backoff)
+    return len(batch)
@@ -0,0 +1,244 @@
+"""
+Opt-in per-request performance instrumentation.
+
+With ``SHARED_CALENDAR_PERF = True`` and ``PerformanceMiddleware`` in
+``MIDDLEWARE``, every request records its wall time, database queries and
+time (through ``connection.execute_wrapper``) and the time spent in spans
+the code marks with ``span``: ``serialize`` for building JSON responses and
+``notify`` for queueing notifications. The figures are sent back in a
+``Server-Timing`` header and added to in-process histograms per view, which
+``calendar/api/metrics/`` returns. The notification worker runs in another
+process, so it stores the time of each push, per push service, on the
+outbox row it delivers (``push_timings``), and the endpoint merges those of
+recent notifications in with ``push_snapshot``.
+
+Disabled, the middleware removes itself at startup and ``span`` is a
+context variable lookup.
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Upper bounds of the histogram buckets
+MILLISECOND_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+COUNT_BOUNDS = (0, 1, 2, 5, 10, 20, 50, 100, float('inf'))
+
+_current = ContextVar('shared_calendar_perf', default=None)
+_disabled = nullcontext()
+
+
+def enabled():
+    return getattr(settings, 'SHARED_CALENDAR_PERF', False)
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their total."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.total = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += value
+
+    def merge(self, counts, total):
+        """Add the bucket counts and total of another histogram with the same bounds."""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+        self.count += sum(counts)
+        self.total += total
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 3),
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): count
+                for bound, count in zip(self.bounds, self.counts)
+            },
+        }
+
+
+class Registry:
+    """Histograms keyed by (name, metric), safe to share between threads."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, metric, value, bounds=MILLISECOND_BOUNDS):
+        with self._lock:
+            histogram = self._histograms.get((name, metric))
+            if histogram is None:
+                histogram = self._histograms[(name, metric)] = Histogram(bounds)
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for (name, metric), histogram in sorted(self._histograms.items()):
+                result.setdefault(name, {})[metric] = histogram.snapshot()
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+class RequestTimings:
+    """What one request spent its time on, in seconds."""
+
+    __slots__ = ('queries', 'query_time', 'spans')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0
+        self.spans = {}
+
+
+@contextmanager
+def _timed(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans[name] = timings.spans.get(name, 0) + time.perf_counter() - started
+
+
+def span(name):
+    """Time a block as part of the current request; does nothing outside an instrumented one."""
+    timings = _current.get()
+    if timings is None:
+        return _disabled
+    return _timed(timings, name)
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.query_time += time.perf_counter() - started
+
+
+def _install(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _push_histograms(timings):
+    histograms = {}
+    for origin, state in (timings or {}).items():
+        histograms.setdefault(origin, Histogram(MILLISECOND_BOUNDS)).merge(state['counts'], state['sum'])
+    return histograms
+
+
+def observe_pushes(timings, results):
+    """
+    Add the time of each push in ``notifications.push_to_subscriptions``
+    results to the push timings of an outbox row, when instrumentation is
+    enabled.
+
+    Args:
+        timings (dict): The row's push timings so far, or None
+        results (dict): Subscription id -> push result
+
+    Returns:
+        dict: Push service -> ``{'counts', 'sum'}`` of its histogram, or
+        ``timings`` unchanged when disabled
+    """
+    if not enabled() or not results:
+        return timings
+    histograms = _push_histograms(timings)
+    for result in results.values():
+        histograms.setdefault(result['origin'], Histogram(MILLISECOND_BOUNDS)).observe(result['duration_ms'])
+    return {origin: {'counts': histogram.counts, 'sum': histogram.total} for origin, histogram in histograms.items()}
+
+
+def push_snapshot(rows):
+    """Merge the push timings of outbox rows into histograms shaped like ``Registry.snapshot``'s."""
+    histograms = {}
+    for timings in rows:
+        for origin, histogram in _push_histograms(timings).items():
+            histograms.setdefault(origin, Histogram(MILLISECOND_BOUNDS)).merge(histogram.counts, histogram.total)
+    return {f'push {origin}': {'push_ms': histogram.snapshot()} for origin, histogram in sorted(histograms.items())}
+
+
+class PerformanceMiddleware:
+    """
+    Time each request and report it in ``Server-Timing`` and the histograms.
+    Place it first in ``MIDDLEWARE`` so the total covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # Every connection, including those the async views' ORM calls run
+        # on in other threads, reports to whichever request is current
+        connection_created.connect(_install)
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    def _finish(self, request, response, timings, elapsed):
+        metrics = [('total', elapsed, None), ('db', timings.query_time, f'{timings.queries} queries')]
+        metrics.extend((name, seconds, None) for name, seconds in timings.spans.items())
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' + (f';desc="{description}"' if description else '')
+            for name, seconds, description in metrics
+        )
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        for name, seconds, _ in metrics:
+            registry.observe(view, f'{name}_ms', seconds * 1000)
+        registry.observe(view, 'queries', timings.queries, COUNT_BOUNDS)
+        return response
@@ -0,0 +1,127 @@
+"""
+Helpers for the weekly recurrence of appointments.
+
+A recurring appointment is stored as a single row that acts as the rule for
+the whole series: ``date`` is the first day of the series, ``recurrence_days``
+the weekdays it repeats on (0 = Monday, 6 = Sunday), ``recurrence_end`` an
+optional last day and ``recurrence_exceptions`` the ISO dates it skips.
+Occurrences are never stored; they are generated when a date range is read.
+
+The weekdays are mirrored as a bitmask in ``recurrence_mask`` so that the
+database can answer "which series occur on this weekday?" with an indexed
+lookup instead of a scan over every row.
+"""
+from datetime import timedelta
+
+# How far past its first day an open-ended series is followed when all of
+# its occurrences are needed at once rather than those of a date range
+SERIES_HORIZON = timedelta(days=366)
+
+
+def weekday_mask(days):
+    """
+    Return the bitmask for a list of weekday numbers.
+
+    Args:
+        days (list): Weekday numbers, 0 = Monday through 6 = Sunday
+
+    Returns:
+        int: Bitmask with bit ``n`` set for every weekday ``n`` in ``days``
+    """
+    mask = 0
+    for day in days or []:
+        day = int(day)
+        if 0 <= day <= 6:
+            mask |= 1 << day
+    return mask
+
+
+def masks_containing(weekday):
+    """
+    Return every non-empty weekday bitmask that includes ``weekday``.
+
+    There are only 64 of them, so ``recurrence_mask__in=masks_containing(d)``
+    stays an index lookup rather than a bitwise test on each row.
+    """
+    bit = 1 << weekday
+    return [mask for mask in range(1, 1 << 7) if mask & bit]
+
+
+def iter_dates(start, end):
+    """Yield every date from ``start`` to ``end`` inclusive."""
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+
+def iter_occurrences(appointment, start, end):
+    """
+    Yield the dates between ``start`` and ``end`` on which an appointment occurs.
+
+    A one-off appointment occurs on its own date. A recurring one occurs on its
+    first day and then on each of its weekdays up to ``recurrence_end``, if
+    any, skipping the dates listed in ``recurrence_exceptions``.
+
+    Args:
+        appointment (dict): Appointment as returned by ``.values()``
+        start (date): First day of the range
+        end (date): Last day of the range, inclusive
+    """
+    first = appointment['date']
+    if not appointment['is_recurring']:
+        if start <= first <= end:
+            yield first
+        return
+
+    last = end
+    if appointment['recurrence_end'] and appointment['recurrence_end'] < last:
+        last = appointment['recurrence_end']
+    mask = weekday_mask(appointment['recurrence_days'])
+    exceptions = set(appointment['recurrence_exceptions'] or [])
+    for day in iter_dates(max(start, first), last):
+        if (day == first or mask & (1 << day.weekday())) and day.isoformat() not in exceptions:
+            yield day
+
+
+def group_by_date(appointments, start, end):
+    """
+    Expand appointment rows onto the days they occur on between two dates.
+
+    Args:
+        appointments (iterable): Appointment dicts as returned by ``.values()``
+        start (date): First day of the range
+        end (date): Last day of the range, inclusive
+
+    Returns:
+        dict: ISO date string -> list of appointments on that day, with an
+        entry (possibly empty) for every day in the range. Each entry carries
+        an ``occurrence_date``; ``date`` stays the first day of the series.
+    """
+    grouped = {day.isoformat(): [] for day in iter_dates(start, end)}
+    for appointment in appointments:
+        for day in iter_occurrences(appointment, start, end):
+            grouped[day.isoformat()].append({**appointment, 'occurrence_date': day})
+    return grouped
+
+
+def series_span(appointments):
+    """
+    Return the first and last day on which appointment rows can occur,
+    following open-ended series for ``SERIES_HORIZON``.
+
+    Returns:
+        tuple: (start date, end date), or (None, None) for no rows
+    """
+    if not appointments:
+        return None, None
+    start = min(appointment['date'] for appointment in appointments)
+    end = max(
+        (appointment['recurrence_end'] or appointment['date'] + SERIES_HORIZON)
+        if appointment['is_recurring'] else appointment['date']
+        for appointment in appointments
+    )
+    return start, end
+
+
+def count_occurrences(appointments, start, end):
+    """Return the number of occurrences of appointment rows between two dates."""
+    return sum(1 for appointment in appointments for _ in iter_occurrences(appointment, start, end))
@@ -0,0 +1,253 @@
+"""
+Edits to recurring series.
+
+Every row of a series shares its ``series_id``: the rules that generate its
+occurrences (see recurrence.py) and any one-off rows that replace a single
+occurrence. Edits are applied with a constant number of set-based queries
+however long the series is, in one of three scopes:
+
+- ``single``: only the occurrence on ``occurrence_date``
+- ``following``: that occurrence and every later one
+- ``all``: the whole series
+
+``QuerySet.update()`` skips ``auto_now``, so every update here sets
+``updated_at`` itself.
+"""
+from datetime import timedelta
+import uuid
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import Appointment
+from .recurrence import weekday_mask
+
+SCOPES = ('single', 'following', 'all')
+
+# Fields shared by every row of a series
+SERIES_FIELDS = ('title', 'start_time', 'end_time', 'can_watch_evee', 'recurrence_days')
+
+# Fields that only describe one rule of a series
+RULE_FIELDS = ('is_recurring', 'recurrence_end')
+
+
+def _series_updates(changes):
+    """Return ``QuerySet.update()`` arguments for the series-wide part of ``changes``."""
+    updates = {field: changes[field] for field in SERIES_FIELDS if field in changes}
+    updates['updated_at'] = timezone.now()
+    if 'recurrence_days' in changes:
+        # One-off rows of a series never match a weekday lookup
+        updates['recurrence_mask'] = models.Case(
+            models.When(is_recurring=True, then=models.Value(weekday_mask(changes['recurrence_days']))),
+            default=models.Value(0),
+        )
+    return updates
+
+
+def _update_row(appointment, changes):
+    """Apply ``changes`` to a single row, giving it a series if it became recurring."""
+    for field, value in changes.items():
+        setattr(appointment, field, value)
+    if appointment.is_recurring and appointment.series_id is None:
+        appointment.series_id = uuid.uuid4()
+    appointment.save()
+    return appointment
+
+
+def _update_single(appointment, occurrence_date, changes):
+    if not appointment.is_recurring:
+        return _update_row(appointment, changes)
+
+    # Skip the occurrence in the rule and replace it with a one-off row
+    rule = Appointment.objects.select_for_update().get(id=appointment.id)
+    exceptions = sorted(set(rule.recurrence_exceptions) | {occurrence_date.isoformat()})
+    Appointment.objects.filter(id=rule.id).update(recurrence_exceptions=exceptions, updated_at=timezone.now())
+    return Appointment.objects.create(
+        calendar_id=rule.calendar_id,
+        user=rule.user,
+        title=changes.get('title', rule.title),
+        date=changes.get('date') or occurrence_date,
+        start_time=changes.get('start_time', rule.start_time),
+        end_time=changes.get('end_time', rule.end_time),
+        can_watch_evee=changes.get('can_watch_evee', rule.can_watch_evee),
+        series_id=rule.series_id,
+    )
+
+
+def _running_rules(series, occurrence_date):
+    """Rules of ``series`` that started before ``occurrence_date`` and are still running on it."""
+    return series.filter(is_recurring=True, date__lt=occurrence_date).filter(
+        models.Q(recurrence_end__isnull=True) | models.Q(recurrence_end__gte=occurrence_date)
+    )
+
+
+def _update_following(appointment, occurrence_date, changes):
+    series = Appointment.objects.filter(series_id=appointment.series_id)
+
+    # Split rules still running on the occurrence: they end the day before
+    # and a copy carries on from the occurrence
+    running = list(_running_rules(series, occurrence_date))
+    if running:
+        series.filter(id__in=[rule.id for rule in running]).update(
+            recurrence_end=occurrence_date - timedelta(days=1), updated_at=timezone.now()
+        )
+        Appointment.objects.bulk_create([
+            Appointment(
+                calendar_id=rule.calendar_id,
+                user=rule.user,
+                title=rule.title,
+                date=occurrence_date,
+                start_time=rule.start_time,
+                end_time=rule.end_time,
+                can_watch_evee=rule.can_watch_evee,
+                is_recurring=True,
+                recurrence_days=rule.recurrence_days,
+                recurrence_end=rule.recurrence_end,
+                recurrence_exceptions=[
+                    day for day in rule.recurrence_exceptions if day >= occurrence_date.isoformat()
+                ],
+                series_id=rule.series_id,
+            )
+            for rule in running
+        ])
+
+    series.filter(date__gte=occurrence_date).update(**_series_updates(changes))
+    return series.filter(date__gte=occurrence_date).order_by('date', 'id').first()
+
+
+def _update_all(appointment, changes):
+    Appointment.objects.filter(series_id=appointment.series_id).update(**_series_updates(changes))
+    rule_changes = {field: changes[field] for field in RULE_FIELDS if field in changes}
+    appointment.refresh_from_db()
+    if appointment.is_recurring and rule_changes:
+        _update_row(appointment, rule_changes)
+    return appointment
+
+
+def update_series(appointment, scope, occurrence_date, changes):
+    """
+    Apply an edit made on one occurrence of an appointment.
+
+    Appointments outside a series are updated directly. The start date of a
+    series is not moved by ``following`` or ``all`` edits; ``date`` only
+    moves a ``single`` occurrence.
+
+    Args:
+        appointment (Appointment): Row the edited occurrence came from
+        scope (str): One of ``SCOPES``
+        occurrence_date (date): Date of the edited occurrence
+        changes (dict): New field values
+
+    Returns:
+        Appointment: The row that now holds the edited occurrence
+    """
+    with transaction.atomic():
+        if appointment.series_id is None:
+            return _update_row(appointment, changes)
+        if scope == 'single':
+            return _update_single(appointment, occurrence_date, changes)
+        if scope == 'following':
+            return _update_following(appointment, occurrence_date, changes)
+        return _update_all(appointment, changes)
+
+
+def _with_series_changes(row, changes):
+    return {**row, **{field: changes[field] for field in SERIES_FIELDS if field in changes}}
+
+
+def preview_update(rows, appointment, scope, occurrence_date, changes):
+    """
+    Work out the rows ``update_series`` would leave, without writing them.
+
+    Args:
+        rows (list): Rows the update can change, as ``.values()`` dicts: the
+            appointment's whole series, or the appointment alone
+        appointment (dict): Row the edited occurrence came from
+        scope (str): One of ``SCOPES``
+        occurrence_date (date): Date of the edited occurrence
+        changes (dict): New field values
+
+    Returns:
+        list: The rows as the update would leave them; those it would
+        create have no ``id``
+    """
+    if appointment['series_id'] is None or (scope == 'single' and not appointment['is_recurring']):
+        return [{**row, **changes} if row['id'] == appointment['id'] else row for row in rows]
+
+    if scope == 'single':
+        exception = occurrence_date.isoformat()
+        after = [
+            {**row, 'recurrence_exceptions': sorted(set(row['recurrence_exceptions']) | {exception})}
+            if row['id'] == appointment['id'] else row
+            for row in rows
+        ]
+        after.append({
+            **appointment,
+            **{field: changes[field] for field in ('title', 'start_time', 'end_time', 'can_watch_evee') if field in changes},
+            'id': None, 'date': changes.get('date') or occurrence_date, 'is_recurring': False,
+            'recurrence_days': [], 'recurrence_end': None, 'recurrence_exceptions': [],
+        })
+        return after
+
+    if scope == 'following':
+        after = []
+        for row in rows:
+            running = row['is_recurring'] and row['date'] < occurrence_date and (
+                row['recurrence_end'] is None or row['recurrence_end'] >= occurrence_date
+            )
+            if running:
+                after.append({**row, 'recurrence_end': occurrence_date - timedelta(days=1)})
+                after.append(_with_series_changes({
+                    **row, 'id': None, 'date': occurrence_date,
+                    'recurrence_exceptions': [
+                        day for day in row['recurrence_exceptions'] if day >= occurrence_date.isoformat()
+                    ],
+                }, changes))
+            elif row['date'] >= occurrence_date:
+                after.append(_with_series_changes(row, changes))
+            else:
+                after.append(row)
+        return after
+
+    after = [_with_series_changes(row, changes) for row in rows]
+    rule_changes = {field: changes[field] for field in RULE_FIELDS if field in changes}
+    if appointment['is_recurring'] and rule_changes:
+        after = [{**row, **rule_changes} if row['id'] == appointment['id'] else row for row in after]
+    return after
+
+
+def delete_series(series_id, scope, occurrence_date):
+    """
+    Delete occurrences of a series.
+
+    Args:
+        series_id (UUID): Series to delete from
+        scope (str): One of ``SCOPES``
+        occurrence_date (date): Occurrence the deletion starts from; unused
+            for ``all``
+
+    Returns:
+        int: Number of rows deleted
+    """
+    series = Appointment.objects.filter(series_id=series_id)
+    with transaction.atomic():
+        if scope == 'single':
+            # Skip the date in the rules that generate it
+            rules = series.filter(is_recurring=True, date__lte=occurrence_date).filter(
+                models.Q(recurrence_end__isnull=True) | models.Q(recurrence_end__gte=occurrence_date)
+            )
+            for rule in rules.select_for_update():
+                exceptions = sorted(set(rule.recurrence_exceptions) | {occurrence_date.isoformat()})
+                series.filter(id=rule.id).update(recurrence_exceptions=exceptions, updated_at=timezone.now())
+            deleted, _ = series.filter(date=occurrence_date, is_recurring=False).delete()
+            return deleted
+
+        if scope == 'following':
+            _running_rules(series, occurrence_date).update(
+                recurrence_end=occurrence_date - timedelta(days=1), updated_at=timezone.now()
+            )
+            deleted, _ = series.filter(date__gte=occurrence_date).delete()
+            return deleted
+
+        deleted, _ = series.delete()
+        return deleted
@@ -1,4 +1,21 @@
 // React calendar app will be implemented here
+
+// The calendar this page shows: the root element's data-calendar, which the
+// project's template can set from the view's `calendar`, else ?calendar= in
+// the page URL. Every API request names it; without it the server answers
+// for the user's first calendar
+const calendarElement = document.getElementById('calendar-root');
+const calendarSlug = (calendarElement && calendarElement.dataset.calendar)
+    || new URLSearchParams(window.location.search).get('calendar') || '';
+
+// An API path with its query parameters and the calendar
+const apiUrl = (path, params = {}) => {
+    const query = new URLSearchParams(params);
+    if (calendarSlug) query.set('calendar', calendarSlug);
+    const search = query.toString();
+    return search ? `${path}?${search}` : path;
+};
+
 const Timeline = () => {
     const hours = Array.from({length: 18}, (_, i) => i + 6); // 6 AM to 11 PM
     const timeSlotHeight = 90; // pixels per hour slot (increased from 60)
@@ -30,10 +47,71 @@ const Timeline = () => {
         };
     });
     const [errors, setErrors] = React.useState({});
+    // Which part of a recurring series an edit applies to: 'single', 'following' or 'all'
+    const [editScope, setEditScope] = React.useState('all');
     const [isSubmitting, setIsSubmitting] = React.useState(false);
     const [appointments, setAppointments] = React.useState([]);
     const [selectedDate, setSelectedDate] = React.useState(new Date().toISOString().split('T')[0]);
 
+    // The day on show, for callbacks that outlive a render
+    const selectedDateRef = React.useRef(selectedDate);
+    selectedDateRef.current = selectedDate;
+
+    // Time from navigation to the calendar's first paint, for comparing builds
+    // (see build_frontend); shown in the browser's performance tools
+    React.useEffect(() => {
+        requestAnimationFrame(() => {
+            performance.mark('calendar:first-paint');
+            performance.measure('calendar:first-paint', {start: 0, end: 'calendar:first-paint'});
+        });
+    }, []);
+
+    // The service worker keeps appointments by day in IndexedDB and answers
+    // range requests from it after a delta sync (see "Offline cache")
+    React.useEffect(() => {
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.register('/service-worker.js').catch(error => {
+                console.error('Error registering service worker:', error);
+            });
+        }
+    }, []);
+
+    // Follow the server's change feed for as long as the calendar is open,
+    // by server-sent events when the server offers them, else by long-polling
+    React.useEffect(() => {
+        let stopped = false;
+        let source = null;
+        const follow = async () => {
+            try {
+                const response = await fetch(apiUrl('/calendar/api/changes/'));
+                const data = await response.json();
+                changeCursor.current = data.cursor;
+                if (data.transport === 'sse' && window.EventSource) {
+                    // Reconnects resume from the last event id by themselves
+                    source = new EventSource(apiUrl('/calendar/api/changes/stream/', {cursor: data.cursor}));
+                    source.addEventListener('changes', (event) => applyChanges(JSON.parse(event.data)));
+                    return;
+                }
+            } catch (error) {
+                console.error('Error starting change feed:', error);
+                return;
+            }
+            while (!stopped) {
+                try {
+                    await pullChanges(25);
+                } catch (error) {
+                    console.error('Error fetching changes:', error);
+                    await new Promise(resolve => setTimeout(resolve, 5000));
+                }
+            }
+        };
+        follow();
+        return () => {
+            stopped = true;
+            if (source) source.close();
+        };
+    }, []);
+
     // Fetch appointments when component mounts or selected date changes
     React.useEffect(() => {
         fetchAppointments();
@@ -70,10 +148,33 @@ const Timeline = () => {
         }));
     };
 
-    const fetchAppointments = async () => {
+    // Appointments already fetched, keyed by YYYY-MM-DD
+    const appointmentsByDate = React.useRef({});
+
+    // Monday to Sunday of the week containing the given YYYY-MM-DD date
+    const getWeekRange = (dateStr) => {
+        const day = new Date(`${dateStr}T00:00:00Z`);
+        const monday = new Date(day);
+        monday.setUTCDate(day.getUTCDate() - ((day.getUTCDay() + 6) % 7));
+        const sunday = new Date(monday);
+        sunday.setUTCDate(monday.getUTCDate() + 6);
+        return [monday.toISOString().split('T')[0], sunday.toISOString().split('T')[0]];
+    };
+
+    const fetchAppointments = async (refresh = false) => {
+        if (refresh) {
+            appointmentsByDate.current = {};
+        }
+        const cached = appointmentsByDate.current[selectedDate];
+        if (cached) {
+            setAppointments(cached);
+            return;
+        }
+
         try {
-            console.log('Fetching appointments for date:', selectedDate);
-            const response = await fetch(`/calendar/api/appointments/get/?date=${selectedDate}`, {
+            const [start, end] = getWeekRange(selectedDate);
+            console.log('Fetching appointments for range:', start, end);
+            const response = await fetch(apiUrl('/calendar/api/appointments/range/', {start, end}), {
                 headers: {
                     'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
                 }
@@ -95,7 +196,8 @@ const Timeline = () => {
                 throw new Error(data.message || 'Error fetching appointments');
             }
             
-            setAppointments(data.appointments || []);
+            Object.assign(appointmentsByDate.current, data.appointments || {});
+            setAppointments(appointmentsByDate.current[selectedDate] || []);
         } catch (error) {
             console.error('Error fetching appointments:', error);
             console.error('Error stack:', error.stack);
@@ -103,6 +205,54 @@ const Timeline = () => {
         }
     };
 
+    // Position in the server's change feed; null until it has been read
+    const changeCursor = React.useRef(null);
+
+    // Whether an appointment row occurs on a YYYY-MM-DD day, as recurrence.iter_occurrences decides
+    const occursOn = (appointment, day) => {
+        if ((appointment.recurrence_exceptions || []).includes(day)) return false;
+        if (appointment.date === day) return true;
+        if (!appointment.is_recurring || appointment.date > day) return false;
+        if (appointment.recurrence_end && appointment.recurrence_end < day) return false;
+        const weekday = (new Date(`${day}T00:00:00Z`).getUTCDay() + 6) % 7;  // 0 = Monday
+        return (appointment.recurrence_days || []).includes(weekday);
+    };
+
+    // Apply a batch from the change feed to the days already fetched, in order
+    const applyChanges = (batch) => {
+        // A slower request can come back after a newer batch was applied
+        if (changeCursor.current !== null && batch.cursor < changeCursor.current) return;
+        const byDate = appointmentsByDate.current;
+        batch.changes.forEach(change => {
+            Object.keys(byDate).forEach(day => {
+                const others = byDate[day].filter(appointment => appointment.id !== change.appointment_id);
+                byDate[day] = change.appointment && occursOn(change.appointment, day)
+                    ? [...others, { ...change.appointment, occurrence_date: day }]
+                    : others;
+            });
+        });
+        changeCursor.current = batch.cursor;
+        setAppointments(byDate[selectedDateRef.current] || []);
+    };
+
+    // Fetch and apply the changes after our cursor, waiting up to `wait` seconds for some
+    const pullChanges = async (wait) => {
+        if (changeCursor.current === null) throw new Error('Change feed not started');
+        const response = await fetch(apiUrl('/calendar/api/changes/', {cursor: changeCursor.current, wait}));
+        if (!response.ok) throw new Error(`Failed to fetch changes: ${response.status}`);
+        applyChanges(await response.json());
+    };
+
+    // Show our own write straight away instead of when the feed next delivers it
+    const syncAfterWrite = async () => {
+        try {
+            await pullChanges(0);
+        } catch (error) {
+            console.error('Error applying changes, reloading instead:', error);
+            fetchAppointments(true);
+        }
+    };
+
     const getTimePosition = (timeStr) => {
         const [hours, minutes] = timeStr.split(':').map(Number);
         const totalMinutes = hours * 60 + minutes;
@@ -160,9 +310,10 @@ const Timeline = () => {
         
         if (appointment.user === currentUsername) {
             setEditingAppointment(appointment);
+            setEditScope('all');
             setFormData({
                 title: appointment.title,
-                date: appointment.date,
+                date: appointment.occurrence_date || appointment.date,
                 start_time: appointment.start_time,
                 end_time: appointment.end_time,
                 can_watch_evee: appointment.can_watch_evee,
@@ -177,12 +328,24 @@ const Timeline = () => {
         if (!editingAppointment) return;
         
         try {
-            const response = await fetch(`/calendar/api/appointments/${editingAppointment.id}/delete/`, {
-                method: 'POST',
-                headers: {
-                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
-                }
-            });
+            const response = editingAppointment.series_id
+                ? await fetch(apiUrl(`/calendar/api/series/${editingAppointment.series_id}/delete/`), {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                    },
+                    body: JSON.stringify({
+                        scope: editScope,
+                        occurrence_date: editingAppointment.occurrence_date || editingAppointment.date
+                    })
+                })
+                : await fetch(apiUrl(`/calendar/api/appointments/${editingAppointment.id}/delete/`), {
+                    method: 'POST',
+                    headers: {
+                        'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                    }
+                });
             if (!response.ok) throw new Error('Failed to delete appointment');
             setShowModal(false);
             setEditingAppointment(null);  // Clear the editing state
@@ -195,7 +358,7 @@ const Timeline = () => {
                 is_recurring: false,
                 recurrence_days: []
             });
-            fetchAppointments();
+            syncAfterWrite();
         } catch (error) {
             console.error('Error deleting appointment:', error);
         }
@@ -219,14 +382,18 @@ const Timeline = () => {
             is_recurring: formData.is_recurring,
             recurrence_days: formData.recurrence_days
         };
+        if (editingAppointment && editingAppointment.series_id) {
+            submitData.scope = editScope;
+            submitData.occurrence_date = editingAppointment.occurrence_date || editingAppointment.date;
+        }
 
         console.log('Submitting appointment data:', submitData);
         console.log('Raw JSON data:', JSON.stringify(submitData));
 
         try {
             const url = editingAppointment 
-                ? `/calendar/api/appointments/${editingAppointment.id}/update/`
-                : '/calendar/api/appointments/create/';
+                ? apiUrl(`/calendar/api/appointments/${editingAppointment.id}/update/`)
+                : apiUrl('/calendar/api/appointments/create/');
             
             console.log('Making request to:', url);
             console.log('CSRF Token:', document.querySelector('[name=csrfmiddlewaretoken]').value);
@@ -273,10 +440,13 @@ const Timeline = () => {
             }
             
             console.log('Server response:', data);
+            if (data.conflicts && data.conflicts.length) {
+                alert(`Saved, but this overlaps ${data.conflicts.length} of your other appointments.`);
+            }
             
             setShowModal(false);
             setEditingAppointment(null);
-            fetchAppointments();
+            syncAfterWrite();
         } catch (error) {
             console.error('Error details:', error);
             console.error('Error stack:', error.stack);
@@ -313,7 +483,7 @@ const Timeline = () => {
             
             return (
                 <div
-                    key={appointment.id}
+                    key={`${appointment.id}-${appointment.occurrence_date || appointment.date}`}
                     onClick={() => handleAppointmentClick(appointment)}
                     style={{
                         position: 'absolute',
@@ -743,6 +913,26 @@ const Timeline = () => {
                                 </div>
                             )}
 
+                            {editingAppointment && editingAppointment.series_id && (
+                                <div style={{ marginBottom: '15px' }}>
+                                    <label style={{ display: 'block', marginBottom: '5px' }}>Apply Edits and Deletes To</label>
+                                    <select
+                                        value={editScope}
+                                        onChange={(e) => setEditScope(e.target.value)}
+                                        style={{
+                                            width: '100%',
+                                            padding: '8px',
+                                            borderRadius: '4px',
+                                            border: '1px solid #ddd'
+                                        }}
+                                    >
+                                        <option value="single">This occurrence</option>
+                                        <option value="following">This and following occurrences</option>
+                                        <option value="all">All occurrences</option>
+                                    </select>
+                                </div>
+                            )}
+
                             <div style={{ display: 'flex', justifyContent: 'space-between', gap: '10px' }}>
                                 <div>
                                     {editingAppointment && (
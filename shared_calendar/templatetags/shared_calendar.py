@@ -0,0 +1,55 @@
+"""
+Template tags for pages that host the calendar.
+
+Templates live in the main project, so the script tags the calendar needs
+come from ``{% calendar_scripts %}`` rather than being written out there.
+"""
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+# Written by ``manage.py build_frontend``
+BUNDLE = 'shared_calendar/calendar.min.js'
+SOURCE = 'js/react-calendar-app.js'
+
+PRODUCTION_REACT = (
+    'https://unpkg.com/react@18.3.1/umd/react.production.min.js',
+    'https://unpkg.com/react-dom@18.3.1/umd/react-dom.production.min.js',
+)
+DEVELOPMENT_REACT = (
+    'https://unpkg.com/react@18/umd/react.development.js',
+    'https://unpkg.com/react-dom@18/umd/react-dom.development.js',
+    'https://unpkg.com/@babel/standalone/babel.min.js',
+)
+
+
+@lru_cache(maxsize=None)
+def bundle_built():
+    return finders.find(BUNDLE) is not None
+
+
+@register.simple_tag
+def calendar_scripts():
+    """
+    Script tags that load React and the calendar app. Once the bundle has
+    been built they load production React and the minified bundle, deferred
+    so they do not block parsing; the bundle's URL carries its content hash
+    under ``ManifestStaticFilesStorage``. Until then the app's source is
+    compiled in the browser by Babel, as in development.
+    """
+    if bundle_built():
+        react = getattr(settings, 'SHARED_CALENDAR_REACT_URLS', PRODUCTION_REACT)
+        return format_html_join(
+            '\n', '<script src="{}" defer></script>', ((url,) for url in (*react, static(BUNDLE)))
+        )
+    return format_html(
+        '{}\n<script src="{}" type="text/babel"></script>',
+        format_html_join('\n', '<script src="{}"></script>', ((url,) for url in DEVELOPMENT_REACT)),
+        static(SOURCE)
+    )
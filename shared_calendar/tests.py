@@ -0,0 +1,342 @@
+from datetime import date, time, timedelta
+import json
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import outbox, perf
+from .availability import find_conflicts
+from .benchmarks.seed import seed
+from .models import Appointment, AppointmentChange, Calendar, CalendarMembership, NotificationOutbox, PushSubscription
+from .outbox import enqueue_notification, process_outbox, subscriptions_for
+
+
+@override_settings(ROOT_URLCONF='shared_calendar.urls', SHARED_CALENDAR_CONFLICTS='flag')
+class CalendarTestCase(TestCase):
+    """Logs the client in as ``USERNAME``, a member of one calendar."""
+    USERNAME = 'alex'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.calendar = Calendar.objects.create(name='Team', slug='team')
+        CalendarMembership.objects.create(calendar=cls.calendar, username=cls.USERNAME)
+
+    def setUp(self):
+        session = self.client.session
+        session['user'] = json.dumps({'username': self.USERNAME})
+        session.save()
+
+
+class BulkWriteQueryTests(CalendarTestCase):
+    """Writes cost a fixed number of queries, however many rows they insert."""
+
+    def create(self, **fields):
+        body = {
+            'user': self.USERNAME, 'title': 'Swim', 'date': '2025-01-06',
+            'start_time': '09:00', 'end_time': '10:00', **fields
+        }
+        return self.client.post('/calendar/api/appointments/create/', json.dumps(body), content_type='application/json')
+
+    def import_csv(self, count):
+        lines = ['title,date,start_time,end_time,is_recurring,recurrence_days']
+        lines.extend(f'Row {number},2025-02-{number % 28 + 1:02d},09:00,10:00,{number % 2},0 2' for number in range(count))
+        return self.client.post(
+            '/calendar/api/appointments/import/?format=csv', '\n'.join(lines), content_type='text/csv'
+        )
+
+    def test_recurring_create(self):
+        # Session, membership, conflicts, then in a savepoint: the insert,
+        # the series rows for the change feed, its entry and the outbox.
+        # The series is one rule row, not a row per day
+        with self.assertNumQueries(9):
+            response = self.create(is_recurring=True, recurrence_days=[0, 2, 4])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Appointment.objects.filter(series_id=response.json()['series_id']).count(), 1)
+
+    def test_import_query_count_does_not_grow_with_rows(self):
+        # Session, membership, then in a savepoint: one INSERT of the rows,
+        # one of their change feed entries and the outbox. Row counts stay
+        # within one INSERT statement on every backend (SQLite binds at
+        # most 999 parameters)
+        for count in (2, 60):
+            with self.assertNumQueries(7):
+                response = self.import_csv(count)
+            self.assertEqual(response.json()['created'], count)
+        self.assertEqual(Appointment.objects.filter(is_recurring=True, recurrence_mask=0b101).count(), 31)
+
+    @override_settings(SHARED_CALENDAR_BULK_BATCH_SIZE=20)
+    def test_import_inserts_in_batches(self):
+        # Two more batches, each one INSERT and one change feed INSERT
+        with self.assertNumQueries(11):
+            response = self.import_csv(60)
+        self.assertEqual(response.json()['created'], 60)
+
+
+class ImportTests(CalendarTestCase):
+
+    def test_import_is_logged(self):
+        # The summary goes in the record's extra fields, which must not clash with LogRecord's own
+        lines = 'title,date,start_time,end_time\nSwim,2025-02-03,09:00,10:00\nRun,2025-02-04,25:00,10:00'
+        with self.assertLogs('shared_calendar.views', 'INFO') as logs:
+            response = self.client.post(
+                '/calendar/api/appointments/import/?format=csv&skip_invalid=1', lines, content_type='text/csv'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        record = logs.records[-1]
+        self.assertEqual((record.row_count, record.created_count, record.error_count), (2, 1, 1))
+
+
+class ConflictTests(CalendarTestCase):
+
+    def test_recurring_create_is_checked_past_its_first_week(self):
+        one_off = Appointment.objects.create(
+            calendar=self.calendar, user=self.USERNAME, title='Dentist', date=date(2025, 1, 22),
+            start_time='09:30', end_time='10:30'
+        )
+        conflicts = find_conflicts(
+            self.calendar, self.USERNAME, date(2025, 1, 6), time(9), time(10),
+            is_recurring=True, recurrence_days=[0, 2], recurrence_end=date(2025, 3, 31)
+        )
+        self.assertEqual(conflicts, [(one_off.id, '2025-01-22')])
+        # Not when the series ends before it
+        self.assertEqual(find_conflicts(
+            self.calendar, self.USERNAME, date(2025, 1, 6), time(9), time(10),
+            is_recurring=True, recurrence_days=[0, 2], recurrence_end=date(2025, 1, 21)
+        ), [])
+
+
+class BatchTests(CalendarTestCase):
+
+    def batch(self, *operations):
+        return self.client.post(
+            '/calendar/api/appointments/batch/', json.dumps({'operations': operations}), content_type='application/json'
+        )
+
+    def create_operation(self, **fields):
+        return {
+            'op': 'create', 'user': self.USERNAME, 'title': 'Swim', 'date': '2025-01-06',
+            'start_time': '09:00', 'end_time': '10:00', **fields
+        }
+
+    def test_malformed_fields_fail_their_operation(self):
+        first, second = (
+            Appointment.objects.create(
+                calendar=self.calendar, user=self.USERNAME, title='Dentist', date=date(2025, 1, day),
+                start_time='12:00', end_time='13:00'
+            )
+            for day in (6, 7)
+        )
+        response = self.batch(
+            {'op': 'update', 'id': first.id, 'date': 'garbage'},
+            {'op': 'update', 'id': second.id, 'start_time': '99:99'},
+            self.create_operation(start_time='99:99'),
+            self.create_operation(is_recurring=True, recurrence_days=[7]),
+            self.create_operation(date='2025-01-07'),
+        )
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'error', 'error', 'skipped'])
+        self.assertIn('Invalid date: garbage', results[0]['message'])
+        self.assertIn('Invalid start_time: 99:99', results[1]['message'])
+        self.assertIn('Invalid start_time: 99:99', results[2]['message'])
+        self.assertIn('Invalid recurrence days', results[3]['message'])
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_creates_conflict_with_each_other(self):
+        response = self.batch(
+            self.create_operation(is_recurring=True, recurrence_days=[0]),
+            self.create_operation(date='2025-01-20', start_time='09:30', end_time='10:30'),
+            self.create_operation(date='2025-01-20', start_time='10:30', end_time='11:00'),
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[1]['conflicts'], [{'index': 0, 'date': '2025-01-20'}])
+        # Back to back is not an overlap
+        self.assertEqual(results[2]['conflicts'], [])
+
+        with override_settings(SHARED_CALENDAR_CONFLICTS='reject'):
+            response = self.batch(self.create_operation(date='2025-02-04'), self.create_operation(date='2025-02-04'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['results'][1]['code'], 409)
+
+    def test_creates_conflict_with_updated_rows(self):
+        moved, made_weekly = (
+            Appointment.objects.create(
+                calendar=self.calendar, user=self.USERNAME, title='Dentist', date=date(2025, 1, day),
+                start_time='09:00', end_time='10:00'
+            )
+            for day in (7, 6)
+        )
+        with override_settings(SHARED_CALENDAR_CONFLICTS='reject'):
+            response = self.batch(
+                {'op': 'update', 'id': moved.id, 'start_time': '14:00', 'end_time': '15:00'},
+                self.create_operation(date='2025-01-07'),
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][1]['conflicts'], [])
+
+        response = self.batch(
+            {'op': 'update', 'id': made_weekly.id, 'is_recurring': True, 'recurrence_days': [0]},
+            self.create_operation(date='2025-01-13'),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][1]['conflicts'], [{'index': 0, 'date': '2025-01-13'}])
+
+    def test_required_fields_cannot_be_emptied(self):
+        appointment = Appointment.objects.create(
+            calendar=self.calendar, user=self.USERNAME, title='Dentist', date=date(2025, 1, 6),
+            start_time='09:00', end_time='10:00'
+        )
+        response = self.batch(
+            {'op': 'update', 'id': appointment.id, 'title': None},
+            self.create_operation(start_time=''),
+        )
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual(results[0]['message'], 'title cannot be empty')
+        self.assertEqual(results[1]['message'], 'start_time cannot be empty')
+
+        response = self.client.post(
+            f'/calendar/api/appointments/{appointment.id}/update/', json.dumps({'end_time': None}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'end_time cannot be empty')
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.title, 'Dentist')
+
+
+@override_settings(
+    SHARED_CALENDAR_PUSH_REQUIRE_FIREBASE=False,
+    WEBPUSH_SETTINGS={'VAPID_PRIVATE_KEY': 'unused', 'VAPID_ADMIN_EMAIL': 'calendar@localhost'}
+)
+class OutboxTests(CalendarTestCase):
+    """The worker against a push service stubbed at ``pywebpush.webpush``."""
+
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create(username=self.USERNAME)
+        self.subscription = PushSubscription.objects.create(
+            user=user, subscription_info={'endpoint': 'https://push.example/alex', 'keys': {}}
+        )
+        self.notification = enqueue_notification('Swim', 'Swim at 09:00', calendar=self.calendar)
+        patcher = mock.patch('shared_calendar.notifications._vapid')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def push(self, *statuses, **options):
+        """Run the worker once, the push service answering with ``statuses`` in turn."""
+        from pywebpush import WebPushException
+
+        def webpush(**kwargs):
+            status = answers.pop(0)
+            if status >= 400:
+                raise WebPushException('Push failed', response=mock.Mock(status_code=status))
+            return mock.Mock(status_code=status)
+
+        answers = list(statuses)
+        with mock.patch('pywebpush.webpush', side_effect=webpush):
+            processed = process_outbox(**options)
+        self.notification.refresh_from_db()
+        return processed
+
+    def test_sent(self):
+        self.assertEqual(self.push(201), 1)
+        self.assertEqual(self.notification.status, NotificationOutbox.SENT)
+        self.assertEqual(self.notification.attempts, 1)
+        self.assertIsNotNone(self.notification.sent_at)
+
+    def test_claimed_notifications_are_leased(self):
+        self.assertEqual(len(outbox._claim(10, lease=timedelta(minutes=5))), 1)
+        # Hidden from other workers until the lease runs out
+        self.assertEqual(outbox._claim(10, lease=timedelta(minutes=5)), [])
+        self.assertEqual(self.push(), 0)
+
+    def test_failed_push_is_retried_with_backoff(self):
+        self.assertEqual(self.push(500, backoff=30), 1)
+        self.assertEqual(self.notification.status, NotificationOutbox.PENDING)
+        self.assertEqual(self.notification.pending_subscriptions, [self.subscription.id])
+        self.assertGreater(self.notification.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        # Not due again until the backoff has passed
+        self.assertEqual(self.push(), 0)
+
+        NotificationOutbox.objects.filter(id=self.notification.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(self.push(201), 1)
+        self.assertEqual(self.notification.status, NotificationOutbox.SENT)
+        self.assertEqual(self.notification.attempts, 2)
+        self.assertIsNone(self.notification.pending_subscriptions)
+
+    def test_gives_up_after_max_attempts(self):
+        self.push(503, max_attempts=1)
+        self.assertEqual(self.notification.status, NotificationOutbox.FAILED)
+        self.assertEqual(self.notification.pending_subscriptions, [self.subscription.id])
+
+    def test_expired_subscription_is_deactivated(self):
+        self.push(410)
+        self.subscription.refresh_from_db()
+        self.assertFalse(self.subscription.active)
+        # An expired subscription is not a failed delivery
+        self.assertEqual(self.notification.status, NotificationOutbox.SENT)
+
+
+@override_settings(SHARED_CALENDAR_PERF=True)
+class PushMetricsTests(CalendarTestCase):
+
+    def test_worker_push_timings_are_reported(self):
+        # The worker keeps its timings on the outbox rows it delivers, for
+        # the web process to read; nothing is observed in this process
+        results = {1: {'origin': 'push.example', 'duration_ms': 30}, 2: {'origin': 'push.example', 'duration_ms': 300}}
+        timings = perf.observe_pushes(perf.observe_pushes(None, results), {1: results[1]})
+        NotificationOutbox.objects.create(title='Swim', body='', push_timings=timings)
+        NotificationOutbox.objects.create(title='Run', body='')
+
+        metrics = self.client.get('/calendar/api/metrics/').json()['metrics']
+        histogram = metrics['push push.example']['push_ms']
+        self.assertEqual((histogram['count'], histogram['sum']), (3, 360))
+        self.assertEqual((histogram['buckets']['50'], histogram['buckets']['500']), (2, 1))
+
+
+class BenchmarkSeedTests(TestCase):
+
+    def test_seed_on_migrated_database(self):
+        # The benchmark seeds a database built from the migrations alone
+        seeded = seed(one_off=10, recurring=2, subscriptions=3, push_url='http://localhost', calendars=2)
+        self.assertEqual(seeded['subscriptions'], 3)
+        self.assertEqual(Appointment.objects.count(), 24)
+        self.assertEqual(PushSubscription.objects.filter(active=True).count(), 3)
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Query plans are only checked on SQLite and PostgreSQL')
+class QueryPlanTests(CalendarTestCase):
+    """The hot read queries are answered from the indexes declared for them."""
+
+    def assertUsesIndexes(self, queryset, *indexes):
+        if connection.vendor == 'postgresql':
+            # Test tables are tiny; make the planner show what it would use on real ones
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        for index in indexes:
+            self.assertIn(index, plan)
+
+    def test_range_read(self):
+        # Both halves of in_range: rows dated in the range, and recurring rules by weekday mask
+        appointments = Appointment.objects.filter(calendar=self.calendar).in_range(date(2025, 1, 6), date(2025, 1, 12))
+        self.assertUsesIndexes(appointments, 'appointment_calendar_date_idx', 'appointment_calendar_rec_idx')
+
+    def test_change_feed_read(self):
+        changes = AppointmentChange.objects.filter(id__gt=0, calendar_id=self.calendar.id).order_by('id')
+        self.assertUsesIndexes(changes, 'appointmentchange_calendar_idx')
+
+    def test_calendar_lookup(self):
+        self.assertUsesIndexes(CalendarMembership.objects.filter(username=self.USERNAME), 'calendar_membership_user_idx')
+
+    def test_member_subscriptions(self):
+        # Notifications fan out to the members' subscriptions by user, not by scanning them all
+        plan = subscriptions_for(self.calendar.id).explain()
+        scan = 'Seq Scan on shared_calendar_pushsubscription' if connection.vendor == 'postgresql' else 'SCAN shared_calendar_pushsubscription'
+        self.assertNotIn(scan, plan)
@@ -1,12 +1,30 @@
+from django.conf import settings
 from django.urls import path
-from .views import CalendarView, create_appointment, get_appointments, update_appointment, delete_appointment, subscribe_to_notifications, unsubscribe_from_notifications
+from . import views, views_async
+from .views import CalendarView, import_appointments, get_availability, get_cache_stats, get_metrics, delete_series_appointments, get_changes, get_delta, get_feed_url, ics_feed, subscribe_to_notifications, unsubscribe_from_notifications
+from .views_async import stream_changes
+
+# The appointment API runs as native async views under ASGI when enabled
+api = views_async if getattr(settings, 'SHARED_CALENDAR_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
     path('calendar/', CalendarView.as_view(), name='calendar'),
-    path('calendar/api/appointments/create/', create_appointment, name='create_appointment'),
-    path('calendar/api/appointments/get/', get_appointments, name='get_appointments'),
-    path('calendar/api/appointments/<int:appointment_id>/update/', update_appointment, name='update_appointment'),
-    path('calendar/api/appointments/<int:appointment_id>/delete/', delete_appointment, name='delete_appointment'),
+    path('calendar/api/appointments/create/', api.create_appointment, name='create_appointment'),
+    path('calendar/api/appointments/import/', import_appointments, name='import_appointments'),
+    path('calendar/api/appointments/batch/', api.batch_appointments, name='batch_appointments'),
+    path('calendar/api/appointments/get/', api.get_appointments, name='get_appointments'),
+    path('calendar/api/appointments/range/', api.get_appointments_range, name='get_appointments_range'),
+    path('calendar/api/availability/', get_availability, name='get_availability'),
+    path('calendar/api/appointments/cache/stats/', get_cache_stats, name='get_cache_stats'),
+    path('calendar/api/metrics/', get_metrics, name='get_metrics'),
+    path('calendar/api/appointments/<int:appointment_id>/update/', api.update_appointment, name='update_appointment'),
+    path('calendar/api/appointments/<int:appointment_id>/delete/', api.delete_appointment, name='delete_appointment'),
+    path('calendar/api/series/<uuid:series_id>/delete/', delete_series_appointments, name='delete_series_appointments'),
+    path('calendar/api/changes/', get_changes, name='get_changes'),
+    path('calendar/api/changes/stream/', stream_changes, name='stream_changes'),
+    path('calendar/api/appointments/delta/', get_delta, name='get_delta'),
+    path('calendar/api/feed/', get_feed_url, name='get_feed_url'),
+    path('calendar/feed/<str:token>/shared-calendar.ics', ics_feed, name='ics_feed'),
     path('calendar/api/notifications/subscribe/', subscribe_to_notifications, name='subscribe_notifications'),
     path('calendar/api/notifications/unsubscribe/', unsubscribe_from_notifications, name='unsubscribe_notifications'),
-] 
\ No newline at end of file
+]
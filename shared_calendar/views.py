@@ -1,332 +1,399 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_POST, require_GET
 from django.views import View
 from django.utils.decorators import method_decorator
+import codecs
+from functools import partial
 import json
 from .models import Appointment, PushSubscription
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from dateutil import parser
 from django.contrib.auth.decorators import login_required
-from django.db import models
-from .notifications import send_notification
+from django.db import transaction
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from . import appointment_api
+from . import appointment_cache
+from . import changes as change_feed
+from . import ics
+from . import identity
+from . import perf
+from . import importer
+from .availability import sweep
+from .appointment_api import APPOINTMENT_FIELDS
+from .outbox import enqueue_notification, push_metrics
+from .recurrence import count_occurrences, group_by_date, series_span
+from .series import SCOPES, delete_series
 
 logger = logging.getLogger(__name__)
 
+# Most per-row errors an import response lists
+MAX_IMPORT_ERRORS = 100
+
+# Salt of the signed tokens in calendar feed URLs
+FEED_SALT = 'shared_calendar.ics_feed'
+
+def _load_days(calendar, start, end):
+    """Read a calendar's appointments from the database, grouped by day as the read APIs return them."""
+    appointments = Appointment.objects.filter(
+        calendar=calendar
+    ).in_range(start, end).values(*APPOINTMENT_FIELDS)
+    return group_by_date(appointments, start, end)
+
+def _range_etag(calendar, start, end):
+    """
+    ETag for a calendar's appointments between ``start`` and ``end``,
+    computed without fetching or serializing them: from the cache's version
+    tokens, or from the latest ``updated_at`` and row count when caching is
+    disabled.
+    """
+    version = appointment_cache.version(identity.cache_scope(calendar.id), start, end)
+    stamp = None
+    if version is None:
+        stamp = Appointment.objects.filter(calendar=calendar).in_range(start, end).aggregate(**appointment_api.version_stamp())
+    return appointment_api.etag(calendar.id, f'{start}:{end}', version, stamp)
+
 def check_session(view_func):
     def wrapper(request, *args, **kwargs):
-        if 'user' not in request.session:
+        username = identity.username(request)
+        if username is None:
             return JsonResponse({
                 'status': 'error',
                 'message': 'Not logged in'
             }, status=401)
+        if identity.calendar(request) is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Access denied'
+            }, status=403)
         return view_func(request, *args, **kwargs)
     return wrapper
 
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class CalendarView(View):
-    ALLOWED_USERS = {'a.westermann.19', 'Ash'}
-
     def get(self, request):
-        if 'user' not in request.session:
+        username = identity.username(request)
+        if username is None:
             return redirect('/')  # Redirect to main site's login
-        
-        username = json.loads(request.session['user'])['username']
-        if username not in self.ALLOWED_USERS:
+
+        calendar = identity.calendar(request)
+        if calendar is None:
             return render(request, 'shared_calendar/access_denied.html', {
                 'username': username
             })
             
         return render(request, 'shared_calendar/calendar.html', {
-            'username': username
+            'username': username,
+            'calendar': calendar
         })
 
 @require_POST
 def create_appointment(request):
+    started = time.perf_counter()
     try:
-        print("\n=== Creating Appointment ===")
-        print("Request session:", request.session)
-        print("Request headers:", request.headers)
-        
         # Check if user is in session
-        if 'user' not in request.session:
-            print("User not in session")
+        username = identity.username(request)
+        if username is None:
+            logger.info("Create appointment rejected: not logged in")
             return JsonResponse({
                 'error': 'Authentication required',
                 'redirect': '/'
             }, status=401)
-            
-        username = json.loads(request.session['user'])['username']
-        print("User from session:", username)
-            
-        print("Raw request body:", request.body)
-        
-        try:
-            data = json.loads(request.body)
-            print("Parsed data:", data)
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {str(e)}")
-            return JsonResponse({
-                'error': f'Invalid JSON data: {str(e)}'
-            }, status=400)
-        
-        # Validate required fields
-        required_fields = ['user', 'title', 'date', 'start_time', 'end_time']
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            print(f"Missing required fields: {missing_fields}")
+        calendar = identity.calendar(request)
+        if calendar is None:
+            logger.warning("Create appointment rejected: %s is not a calendar member", username, extra={'user': username})
             return JsonResponse({
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
-            }, status=400)
-        
-        # Validate that the user in the request matches the session user
-        if data['user'] != username:
-            print(f"User mismatch: request user {data['user']} != session user {username}")
-            return JsonResponse({
-                'error': 'User mismatch'
+                'error': 'Access denied'
             }, status=403)
-        
-        # Validate date format
-        print(f"Validating date: {data['date']}")
-        try:
-            date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-            print(f"Successfully parsed date: {date}")
-        except ValueError as e:
-            print(f"Date parsing error: {str(e)}")
-            return JsonResponse({
-                'error': f'Invalid date format: {data["date"]}. Must be in YYYY-MM-DD format.'
-            }, status=400)
-        
-        # Extract recurrence data
-        is_recurring = data.get('is_recurring', False)
-        recurrence_days = data.get('recurrence_days', [])
-        
-        print("\nRecurrence details:")
-        print(f"is_recurring: {is_recurring}")
-        print(f"recurrence_days: {recurrence_days}")
-        
-        # Create the initial appointment
+
+        fields, error = appointment_api.parse_create(request.body, username, calendar)
+        if error is not None:
+            return error
+
+        conflicts, error = appointment_api.check_conflicts(fields)
+        if error is not None:
+            return error
+
         try:
-            appointment = Appointment.objects.create(
-                user=username,
-                title=data['title'],
-                date=date,
-                start_time=data['start_time'],
-                end_time=data['end_time'],
-                can_watch_evee=data.get('can_watch_evee', False),
-                is_recurring=is_recurring,
-                recurrence_days=recurrence_days
-            )
-            
-            # Send notification
-            send_notification(
-                title="New Appointment",
-                body=f"{username} created a new appointment: {data['title']}",
-                data={
-                    'type': 'appointment_created',
-                    'appointment_id': str(appointment.id),
-                    'user': username
-                }
-            )
-            
-            print("\nCreated initial appointment:")
-            print(f"ID: {appointment.id}")
-            print(f"User: {appointment.user}")
-            print(f"Title: {appointment.title}")
-            print(f"Date: {appointment.date}")
-            print(f"Recurring: {appointment.is_recurring}")
-            print(f"Recurrence days: {appointment.recurrence_days}")
+            appointment = appointment_api.create(fields)
         except Exception as e:
-            print(f"Error creating appointment: {str(e)}")
-            print(f"Error type: {type(e)}")
-            import traceback
-            print("Traceback:")
-            print(traceback.format_exc())
+            logger.exception("Error creating appointment", extra={'user': username})
             return JsonResponse({
                 'error': f'Error creating appointment: {str(e)}'
             }, status=400)
         
-        # If recurring, create additional instances for the next 6 months
-        if is_recurring and recurrence_days:
-            print("\nCreating recurring instances...")
-            end_date = date + timedelta(days=180)  # Create instances for 6 months
-            
-            current_date = date
-            while current_date <= end_date:
-                if current_date.weekday() in recurrence_days and current_date != date:
-                    try:
-                        Appointment.objects.create(
-                            user=username,  # Use the username from session
-                            title=data['title'],
-                            date=current_date,
-                            start_time=data['start_time'],
-                            end_time=data['end_time'],
-                            can_watch_evee=data.get('can_watch_evee', False),
-                            is_recurring=True,
-                            recurrence_days=recurrence_days
-                        )
-                        print(f"Created recurring instance for {current_date}")
-                    except Exception as e:
-                        print(f"Error creating recurring instance for {current_date}: {str(e)}")
-                current_date += timedelta(days=1)
-        
-        return JsonResponse({
-            'id': appointment.id,
-            'user': appointment.user,
-            'title': appointment.title,
-            'date': appointment.date,
-            'start_time': appointment.start_time,
-            'end_time': appointment.end_time,
-            'can_watch_evee': appointment.can_watch_evee,
+        logger.info("Created appointment %s", appointment.id, extra={
+            'user': username,
+            'appointment_id': appointment.id,
             'is_recurring': appointment.is_recurring,
-            'recurrence_days': appointment.recurrence_days
+            'conflicts': len(conflicts),
+            'duration_ms': (time.perf_counter() - started) * 1000,
         })
+        return JsonResponse({**appointment_api.appointment_data(appointment), 'conflicts': conflicts})
     except Exception as e:
-        print(f"\nError in create_appointment view: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print("Traceback:")
-        print(traceback.format_exc())
+        logger.exception("Error in create_appointment view")
         return JsonResponse({
-            'error': str(e),
-            'traceback': traceback.format_exc()
+            'error': str(e)
         }, status=500)
 
+@csrf_exempt
+@require_POST
+@check_session
+def import_appointments(request):
+    """
+    Import appointments for the logged in user from a CSV or iCalendar file,
+    sent as the ``file`` of a form upload or as the request body. The format
+    is taken from ``format`` or the file name, CSV by default. Pass
+    ``dry_run=1`` to only validate, and ``skip_invalid=1`` to import the
+    valid rows of a file that has errors.
+    """
+    started = time.perf_counter()
+    username = identity.username(request)
+    upload = request.FILES.get('file')
+    file_format = request.GET.get('format')
+    if file_format is None:
+        name = upload.name.lower() if upload is not None else ''
+        is_ics = name.endswith('.ics') or request.content_type == 'text/calendar'
+        file_format = 'ics' if is_ics else 'csv'
+    if file_format not in importer.FORMATS:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Invalid format: {file_format}. Must be one of {", ".join(importer.FORMATS)}.'
+        }, status=400)
+
+    lines = codecs.iterdecode(upload if upload is not None else request, 'utf-8-sig')
+    try:
+        summary = importer.import_rows(
+            importer.read(file_format, lines), username, identity.calendar(request),
+            dry_run=request.GET.get('dry_run') in ('1', 'true'),
+            skip_invalid=request.GET.get('skip_invalid') in ('1', 'true')
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Could not read file: {str(e)}'
+        }, status=400)
+
+    logger.info("Imported %d of %d appointments", summary['created'], summary['rows'], extra={
+        'user': username,
+        'row_count': summary['rows'],
+        'created_count': summary['created'],
+        'error_count': len(summary['errors']),
+        'dry_run': summary['dry_run'],
+        'duration_ms': (time.perf_counter() - started) * 1000,
+    })
+    failed = summary['errors'] and not summary['created'] and not summary['dry_run']
+    return JsonResponse({
+        'status': 'error' if failed else 'success',
+        **summary,
+        'error_count': len(summary['errors']),
+        'errors': summary['errors'][:MAX_IMPORT_ERRORS]
+    }, status=400 if failed else 200)
+
 @require_GET
 @check_session
 def get_appointments(request):
+    started = time.perf_counter()
     try:
-        print("\n=== Getting Appointments ===")
-        date = request.GET.get('date')
-        print(f"Requested date: {date}")
-        
-        if not date:
-            print("No date parameter provided")
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Date parameter is required'
-            }, status=400)
+        parsed_date, error = appointment_api.parse_day(request.GET)
+        if error is not None:
+            return error
 
-        try:
-            # Validate date format
-            parsed_date = datetime.strptime(date, '%Y-%m-%d').date()
-            print(f"Parsed date: {parsed_date}")
-        except ValueError as e:
-            print(f"Invalid date format: {date}")
-            return JsonResponse({
-                'status': 'error',
-                'message': f'Invalid date format: {date}. Must be in YYYY-MM-DD format.'
-            }, status=400)
+        calendar = identity.calendar(request)
+        etag = _range_etag(calendar, parsed_date, parsed_date)
+        not_modified = appointment_api.conditional(request, etag)
+        if not_modified is not None:
+            return not_modified
 
-        # Get the day of week (0 = Monday, 6 = Sunday)
-        day_of_week = parsed_date.weekday()
-        print(f"Day of week: {day_of_week}")
-
-        # Get all appointments for both users
-        all_appointments = Appointment.objects.filter(
-            user__in=['a.westermann.19', 'Ash']
-        ).values(
-            'id', 'title', 'date', 'start_time', 'end_time', 'can_watch_evee', 'user',
-            'is_recurring', 'recurrence_days'
+        # The calendar's appointments on this date, including recurring occurrences
+        grouped, hit = appointment_cache.get_days(
+            identity.cache_scope(calendar.id), parsed_date, parsed_date, partial(_load_days, calendar)
         )
+        appointments_list = grouped[parsed_date.isoformat()]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Found %d appointments on %s", len(appointments_list), parsed_date, extra={
+                'rows': len(appointments_list),
+                'cache_hit': hit,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
         
-        # Filter appointments in Python instead of SQL
-        appointments_list = []
-        for appointment in all_appointments:
-            # Check if it's a recurring appointment that includes this day
-            if appointment['is_recurring'] and day_of_week in appointment['recurrence_days']:
-                appointments_list.append(appointment)
-            # Or if it's on this exact date
-            elif appointment['date'] == parsed_date:
-                appointments_list.append(appointment)
-        
-        print(f"Found {len(appointments_list)} appointments")
-        print("Appointments:", appointments_list)
-        
+        with perf.span('serialize'):
+            response = JsonResponse({
+                'status': 'success',
+                'appointments': appointments_list
+            })
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return appointment_api.conditional(request, etag, response)
+    except Exception as e:
+        logger.exception("Error in get_appointments view")
         return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
+@require_GET
+@check_session
+def get_appointments_range(request):
+    """
+    Return appointments for every day from ``start`` to ``end`` (inclusive),
+    grouped by ISO date, with recurring appointments expanded onto each day
+    they repeat on. Serves week and month views in a single query, or from
+    the per-day cache.
+    """
+    start_date, end_date, error = appointment_api.parse_range(request.GET)
+    if error is not None:
+        return error
+
+    calendar = identity.calendar(request)
+    etag = _range_etag(calendar, start_date, end_date)
+    not_modified = appointment_api.conditional(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    grouped, hit = appointment_cache.get_days(
+        identity.cache_scope(calendar.id), start_date, end_date, partial(_load_days, calendar)
+    )
+
+    with perf.span('serialize'):
+        response = JsonResponse({
             'status': 'success',
-            'appointments': appointments_list
+            'start': start_date,
+            'end': end_date,
+            'appointments': grouped
         })
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return appointment_api.conditional(request, etag, response)
+
+@require_GET
+@check_session
+def get_availability(request):
+    """
+    Free/busy from ``start`` to ``end`` for the calendar's members: when
+    each is busy and free, when all are busy at once, and the gaps where
+    none can watch Evee. Intervals are [start, end] datetime pairs.
+    """
+    start_date, end_date, error = appointment_api.parse_range(request.GET)
+    if error is not None:
+        return error
+
+    calendar = identity.calendar(request)
+    etag = _range_etag(calendar, start_date, end_date)
+    not_modified = appointment_api.conditional(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    grouped, _ = appointment_cache.get_days(
+        identity.cache_scope(calendar.id), start_date, end_date, partial(_load_days, calendar)
+    )
+    occurrences = (appointment for appointments in grouped.values() for appointment in appointments)
+
+    availability = sweep(occurrences, identity.members(calendar), start_date, end_date)
+    with perf.span('serialize'):
+        response = JsonResponse({
+            'status': 'success',
+            'start': start_date,
+            'end': end_date,
+            **availability
+        })
+    return appointment_api.conditional(request, etag, response)
+
+@require_GET
+@check_session
+def get_metrics(request):
+    """
+    Return this process's request histograms per view, and the notification
+    worker's push histograms per push service, recorded when
+    ``SHARED_CALENDAR_PERF`` is enabled; see perf.py.
+    """
+    metrics = perf.registry.snapshot()
+    if perf.enabled():
+        metrics.update(push_metrics())
+    return JsonResponse({
+        'status': 'success',
+        'enabled': perf.enabled(),
+        'metrics': metrics
+    })
+
+@require_GET
+@check_session
+def get_cache_stats(request):
+    """Return this process's hit and miss counts for the per-day appointment cache."""
+    return JsonResponse({
+        'status': 'success',
+        'cache': appointment_cache.stats()
+    })
+
+@csrf_exempt
+@require_POST
+@check_session
+def batch_appointments(request):
+    """
+    Apply a list of creates, updates and deletes atomically, e.g. for
+    drag-and-drop rescheduling or clearing a week. Each operation has an
+    ``op`` and the fields of the matching single-appointment request,
+    plus the ``id`` of the appointment to update or delete. Returns a
+    result per operation, in order; if any operation is invalid none are
+    applied.
+    """
+    started = time.perf_counter()
+    operations, error = appointment_api.parse_batch(request.body)
+    if error is not None:
+        return error
+
+    username = identity.username(request)
+    try:
+        results, failed = appointment_api.batch(operations, username, identity.calendar(request))
     except Exception as e:
-        print(f"\nError in get_appointments view: {str(e)}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print("Traceback:")
-        print(traceback.format_exc())
+        logger.exception("Error applying batch", extra={'user': username})
         return JsonResponse({
             'status': 'error',
             'message': str(e)
-        }, status=500)
+        }, status=400)
+
+    logger.info("Applied batch of %d operations", len(operations), extra={
+        'user': username,
+        'rows': len(operations),
+        'failed': failed,
+        'duration_ms': (time.perf_counter() - started) * 1000,
+    })
+    return appointment_api.batch_response(results, failed)
 
 @csrf_exempt
 @require_POST
 @check_session
 def update_appointment(request, appointment_id):
+    started = time.perf_counter()
     try:
-        data = json.loads(request.body)
-        print("Update data:", data)
-
         try:
-            appointment = Appointment.objects.get(id=appointment_id)
+            appointment = Appointment.objects.get(id=appointment_id, calendar=identity.calendar(request))
             # Only allow updating if the current user owns the appointment
-            if appointment.user != json.loads(request.session['user'])['username']:
+            if appointment.user != identity.username(request):
                 return JsonResponse({
                     'status': 'error',
                     'message': 'Not authorized to update this appointment'
                 }, status=403)
 
-            # Update the appointment
-            appointment.title = data.get('title', appointment.title)
-            appointment.date = data.get('date', appointment.date)
-            appointment.start_time = data.get('start_time', appointment.start_time)
-            appointment.end_time = data.get('end_time', appointment.end_time)
-            appointment.can_watch_evee = data.get('can_watch_evee', appointment.can_watch_evee)
-            appointment.is_recurring = data.get('is_recurring', appointment.is_recurring)
-            appointment.recurrence_days = data.get('recurrence_days', appointment.recurrence_days)
-            appointment.save()
-            
-            # Send notification
-            send_notification(
-                title="Appointment Updated",
-                body=f"{appointment.user} updated appointment: {appointment.title}",
-                data={
-                    'type': 'appointment_updated',
-                    'appointment_id': str(appointment.id),
-                    'user': appointment.user
-                }
-            )
+            scope, occurrence_date, changes, error = appointment_api.parse_update(request.body, appointment)
+            if error is not None:
+                return error
 
-            # If this is a recurring appointment, update all instances
-            if appointment.is_recurring and appointment.recurrence_days:
-                # Update all instances of this recurring appointment
-                recurring_appointments = Appointment.objects.filter(
-                    title=appointment.title,
-                    start_time=appointment.start_time,
-                    end_time=appointment.end_time,
-                    user=appointment.user,
-                    is_recurring=True
-                ).exclude(id=appointment.id)
-                
-                for recurring in recurring_appointments:
-                    recurring.title = appointment.title
-                    recurring.start_time = appointment.start_time
-                    recurring.end_time = appointment.end_time
-                    recurring.can_watch_evee = appointment.can_watch_evee
-                    recurring.recurrence_days = appointment.recurrence_days
-                    recurring.save()
+            appointment = appointment_api.update(appointment, scope, occurrence_date, changes)
+            logger.info("Updated appointment %s", appointment_id, extra={
+                'user': appointment.user,
+                'appointment_id': appointment.id,
+                'scope': scope,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
 
             return JsonResponse({
                 'status': 'success',
-                'id': appointment.id,
-                'title': appointment.title,
-                'date': appointment.date,
-                'start_time': appointment.start_time,
-                'end_time': appointment.end_time,
-                'can_watch_evee': appointment.can_watch_evee,
-                'is_recurring': appointment.is_recurring,
-                'recurrence_days': appointment.recurrence_days
+                **appointment_api.appointment_data(appointment)
             })
         except Appointment.DoesNotExist:
             return JsonResponse({
@@ -334,7 +401,7 @@ def update_appointment(request, appointment_id):
                 'message': 'Appointment not found'
             }, status=404)
     except Exception as e:
-        print("Error updating appointment:", str(e))
+        logger.exception("Error updating appointment %s", appointment_id, extra={'appointment_id': appointment_id})
         return JsonResponse({
             'status': 'error',
             'message': str(e)
@@ -344,33 +411,23 @@ def update_appointment(request, appointment_id):
 @require_POST
 @check_session
 def delete_appointment(request, appointment_id):
+    started = time.perf_counter()
     try:
         try:
-            appointment = Appointment.objects.get(id=appointment_id)
+            appointment = Appointment.objects.get(id=appointment_id, calendar=identity.calendar(request))
             # Only allow deletion if the current user owns the appointment
-            if appointment.user != json.loads(request.session['user'])['username']:
+            if appointment.user != identity.username(request):
                 return JsonResponse({
                     'status': 'error',
                     'message': 'Not authorized to delete this appointment'
                 }, status=403)
 
-            # Get appointment details before deleting
-            appointment_title = appointment.title
-            appointment_user = appointment.user
-            
-            # Delete the appointment
-            appointment.delete()
-            
-            # Send notification
-            send_notification(
-                title="Appointment Deleted",
-                body=f"{appointment_user} deleted appointment: {appointment_title}",
-                data={
-                    'type': 'appointment_deleted',
-                    'appointment_id': str(appointment_id),
-                    'user': appointment_user
-                }
-            )
+            appointment_api.delete(appointment)
+            logger.info("Deleted appointment %s", appointment_id, extra={
+                'user': appointment.user,
+                'appointment_id': appointment_id,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
 
             return JsonResponse({
                 'status': 'success'
@@ -381,12 +438,220 @@ def delete_appointment(request, appointment_id):
                 'message': 'Appointment not found'
             }, status=404)
     except Exception as e:
-        print("Error deleting appointment:", str(e))
+        logger.exception("Error deleting appointment %s", appointment_id, extra={'appointment_id': appointment_id})
         return JsonResponse({
             'status': 'error',
             'message': str(e)
         }, status=400)
 
+@csrf_exempt
+@require_POST
+@check_session
+def delete_series_appointments(request, series_id):
+    """
+    Delete a single occurrence, an occurrence and every later one, or the
+    whole of a recurring series, with one notification for the operation.
+    Reports the number of occurrences removed; when there were none, nobody
+    is notified.
+    """
+    try:
+        data = json.loads(request.body) if request.body else {}
+    except json.JSONDecodeError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Invalid JSON data: {str(e)}'
+        }, status=400)
+
+    scope = data.get('scope', 'all')
+    if scope not in SCOPES:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Invalid scope: {scope}. Must be one of {", ".join(SCOPES)}.'
+        }, status=400)
+
+    occurrence_date = None
+    if scope != 'all':
+        try:
+            occurrence_date = datetime.strptime(data.get('occurrence_date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'An occurrence_date in YYYY-MM-DD format is required for this scope'
+            }, status=400)
+
+    calendar = identity.calendar(request)
+    owners = set(Appointment.objects.filter(
+        series_id=series_id, calendar=calendar
+    ).values_list('user', flat=True).distinct())
+    if not owners:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Series not found'
+        }, status=404)
+    username = identity.username(request)
+    if owners != {username}:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Not authorized to delete this series'
+        }, status=403)
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        series = Appointment.objects.filter(series_id=series_id, calendar=calendar)
+        before = list(series.values(*APPOINTMENT_FIELDS))
+        rows = delete_series(series_id, scope, occurrence_date)
+        after = list(series.values(*APPOINTMENT_FIELDS))
+        appointment_api.record_write(before, after)
+        # Occurrences rather than rows: a single occurrence of a rule is
+        # removed by an exception, and a rule stands for many
+        start, end = series_span(before)
+        deleted = count_occurrences(before, start, end) - count_occurrences(after, start, end)
+        if deleted:
+            enqueue_notification(
+                title="Appointment Deleted",
+                body=f"{username} deleted a recurring appointment",
+                data={
+                    'type': 'series_deleted',
+                    'series_id': str(series_id),
+                    'scope': scope,
+                    'user': username
+                },
+                calendar=calendar
+            )
+    logger.info("Deleted %d occurrences of series %s", deleted, series_id, extra={
+        'user': username,
+        'series_id': str(series_id),
+        'scope': scope,
+        'rows': rows,
+        'occurrences': deleted,
+        'duration_ms': (time.perf_counter() - started) * 1000,
+    })
+
+    return JsonResponse({
+        'status': 'success',
+        'deleted': deleted
+    })
+
+@require_GET
+@check_session
+def get_changes(request):
+    """
+    Long-poll the calendar's change feed: return the changes after
+    ``cursor`` as soon as there are any, or an empty list after ``wait``
+    seconds (at most ``SHARED_CALENDAR_CHANGES_TIMEOUT``). Without a cursor,
+    return the current one and the transport clients should follow the
+    feed with.
+    """
+    if 'cursor' not in request.GET:
+        return JsonResponse({
+            'status': 'success',
+            'cursor': change_feed.latest_cursor(),
+            'changes': [],
+            'transport': getattr(settings, 'SHARED_CALENDAR_CHANGES_TRANSPORT', 'poll')
+        })
+
+    timeout = getattr(settings, 'SHARED_CALENDAR_CHANGES_TIMEOUT', 25)
+    try:
+        cursor = int(request.GET['cursor'])
+        wait = min(float(request.GET.get('wait', timeout)), timeout)
+    except ValueError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'cursor must be an integer and wait a number of seconds'
+        }, status=400)
+
+    changes, cursor = change_feed.wait_for_changes(
+        cursor, wait, getattr(settings, 'SHARED_CALENDAR_CHANGES_POLL_INTERVAL', 1),
+        calendar_id=identity.calendar(request).id
+    )
+    return JsonResponse({
+        'status': 'success',
+        'cursor': cursor,
+        'changes': changes
+    })
+
+@require_GET
+@check_session
+def get_delta(request):
+    """
+    Return what changed in the calendar after the ``since`` cursor without
+    waiting: the current row of each changed appointment and the ids of
+    deleted ones. Clients that keep appointments offline sync with this
+    instead of reloading days. Without ``since``, return the cursor to
+    start from, read before loading the days to keep.
+    """
+    calendar = identity.calendar(request)
+    if 'since' not in request.GET:
+        return JsonResponse({
+            'status': 'success',
+            'calendar': calendar.id,
+            'cursor': change_feed.latest_cursor(),
+            'changed': [],
+            'deleted': [],
+            'more': False
+        })
+
+    try:
+        since = int(request.GET['since'])
+    except ValueError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'since must be an integer cursor'
+        }, status=400)
+
+    with perf.span('serialize'):
+        return JsonResponse({
+            'status': 'success',
+            'calendar': calendar.id,
+            **change_feed.delta_since(since, calendar.id)
+        })
+
+@require_GET
+@check_session
+def get_feed_url(request):
+    """Return the logged in user's feed URL for the calendar, for subscribing from other calendar clients."""
+    token = signing.dumps(
+        {'user': identity.username(request), 'calendar': identity.calendar(request).id}, salt=FEED_SALT
+    )
+    return JsonResponse({
+        'status': 'success',
+        'url': request.build_absolute_uri(reverse('ics_feed', args=[token]))
+    })
+
+@require_GET
+def ics_feed(request, token):
+    """
+    Stream a calendar as iCalendar. The signed token in the URL names the
+    user and calendar and stands in for the session, which calendar clients
+    do not have. Rows are
+    read in chunks of ``SHARED_CALENDAR_FEED_CHUNK_SIZE`` as the response is
+    written, so memory use does not grow with the number of appointments.
+    """
+    try:
+        payload = signing.loads(token, salt=FEED_SALT)
+    except signing.BadSignature:
+        return HttpResponse('Invalid feed token', status=404, content_type='text/plain')
+    # Tokens issued before calendars existed hold just the username
+    if isinstance(payload, str):
+        payload = {'user': payload, 'calendar': None}
+    username = payload['user']
+    calendar = identity.find_calendar(username, calendar_id=payload['calendar'])
+    if calendar is None:
+        return HttpResponse('Access denied', status=403, content_type='text/plain')
+
+    appointments = Appointment.objects.filter(calendar=calendar)
+    etag = appointment_api.etag(f'feed:{calendar.id}', username, None, appointments.aggregate(**appointment_api.version_stamp()))
+    not_modified = appointment_api.conditional(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    rows = appointments.values(*ics.FEED_FIELDS).iterator(
+        chunk_size=getattr(settings, 'SHARED_CALENDAR_FEED_CHUNK_SIZE', 500)
+    )
+    response = StreamingHttpResponse(ics.calendar(rows), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="shared-calendar.ics"'
+    return appointment_api.conditional(request, etag, response)
+
 @require_POST
 @csrf_exempt
 def subscribe_to_notifications(request):
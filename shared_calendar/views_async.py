@@ -0,0 +1,340 @@
+"""
+Native async versions of the appointment API views, for ASGI deployments.
+
+Set ``SHARED_CALENDAR_ASYNC_VIEWS = True`` to route the appointment API to
+them. They share validation and serialization with views.py through
+appointment_api.py. Reads go through the async cache and ORM. Each write
+runs in one ``sync_to_async`` call, because the async ORM cannot hold a
+transaction. That call covers the write, its change feed entry and its
+queued notification. Notifications are only queued during a request, never sent.
+"""
+from functools import partial
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from . import appointment_api
+from . import appointment_cache
+from . import changes as change_feed
+from . import identity
+from . import perf
+from .appointment_api import APPOINTMENT_FIELDS
+from .models import Appointment
+from .recurrence import group_by_date
+
+logger = logging.getLogger(__name__)
+
+
+def check_session(view_func):
+    async def wrapper(request, *args, **kwargs):
+        username = await identity.ausername(request)
+        if username is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Not logged in'
+            }, status=401)
+        if await identity.acalendar(request) is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Access denied'
+            }, status=403)
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+async def _load_days(calendar, start, end):
+    appointments = Appointment.objects.filter(
+        calendar=calendar
+    ).in_range(start, end).values(*APPOINTMENT_FIELDS)
+    return group_by_date([appointment async for appointment in appointments], start, end)
+
+
+async def _range_etag(calendar, start, end):
+    version = await appointment_cache.aversion(identity.cache_scope(calendar.id), start, end)
+    stamp = None
+    if version is None:
+        stamp = await Appointment.objects.filter(
+            calendar=calendar
+        ).in_range(start, end).aaggregate(**appointment_api.version_stamp())
+    return appointment_api.etag(calendar.id, f'{start}:{end}', version, stamp)
+
+
+@require_POST
+async def create_appointment(request):
+    started = time.perf_counter()
+    try:
+        username = await identity.ausername(request)
+        if username is None:
+            logger.info("Create appointment rejected: not logged in")
+            return JsonResponse({
+                'error': 'Authentication required',
+                'redirect': '/'
+            }, status=401)
+        calendar = await identity.acalendar(request)
+        if calendar is None:
+            logger.warning("Create appointment rejected: %s is not a calendar member", username, extra={'user': username})
+            return JsonResponse({
+                'error': 'Access denied'
+            }, status=403)
+
+        fields, error = appointment_api.parse_create(request.body, username, calendar)
+        if error is not None:
+            return error
+
+        conflicts, error = await sync_to_async(appointment_api.check_conflicts)(fields)
+        if error is not None:
+            return error
+
+        try:
+            appointment = await sync_to_async(appointment_api.create)(fields)
+        except Exception as e:
+            logger.exception("Error creating appointment", extra={'user': username})
+            return JsonResponse({
+                'error': f'Error creating appointment: {str(e)}'
+            }, status=400)
+
+        logger.info("Created appointment %s", appointment.id, extra={
+            'user': username,
+            'appointment_id': appointment.id,
+            'is_recurring': appointment.is_recurring,
+            'conflicts': len(conflicts),
+            'duration_ms': (time.perf_counter() - started) * 1000,
+        })
+        return JsonResponse({**appointment_api.appointment_data(appointment), 'conflicts': conflicts})
+    except Exception as e:
+        logger.exception("Error in create_appointment view")
+        return JsonResponse({
+            'error': str(e)
+        }, status=500)
+
+
+@require_GET
+@check_session
+async def get_appointments(request):
+    started = time.perf_counter()
+    try:
+        parsed_date, error = appointment_api.parse_day(request.GET)
+        if error is not None:
+            return error
+
+        calendar = await identity.acalendar(request)
+        etag = await _range_etag(calendar, parsed_date, parsed_date)
+        not_modified = appointment_api.conditional(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        grouped, hit = await appointment_cache.aget_days(
+            identity.cache_scope(calendar.id), parsed_date, parsed_date, partial(_load_days, calendar)
+        )
+        appointments_list = grouped[parsed_date.isoformat()]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Found %d appointments on %s", len(appointments_list), parsed_date, extra={
+                'rows': len(appointments_list),
+                'cache_hit': hit,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
+
+        with perf.span('serialize'):
+            response = JsonResponse({
+                'status': 'success',
+                'appointments': appointments_list
+            })
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return appointment_api.conditional(request, etag, response)
+    except Exception as e:
+        logger.exception("Error in get_appointments view")
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
+
+@require_GET
+@check_session
+async def get_appointments_range(request):
+    """Async version of ``views.get_appointments_range``."""
+    start_date, end_date, error = appointment_api.parse_range(request.GET)
+    if error is not None:
+        return error
+
+    calendar = await identity.acalendar(request)
+    etag = await _range_etag(calendar, start_date, end_date)
+    not_modified = appointment_api.conditional(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    grouped, hit = await appointment_cache.aget_days(
+        identity.cache_scope(calendar.id), start_date, end_date, partial(_load_days, calendar)
+    )
+
+    with perf.span('serialize'):
+        response = JsonResponse({
+            'status': 'success',
+            'start': start_date,
+            'end': end_date,
+            'appointments': grouped
+        })
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return appointment_api.conditional(request, etag, response)
+
+
+@csrf_exempt
+@require_POST
+@check_session
+async def update_appointment(request, appointment_id):
+    started = time.perf_counter()
+    try:
+        try:
+            calendar = await identity.acalendar(request)
+            appointment = await Appointment.objects.aget(id=appointment_id, calendar=calendar)
+            # Only allow updating if the current user owns the appointment
+            if appointment.user != await identity.ausername(request):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Not authorized to update this appointment'
+                }, status=403)
+
+            scope, occurrence_date, changes, error = appointment_api.parse_update(request.body, appointment)
+            if error is not None:
+                return error
+
+            appointment = await sync_to_async(appointment_api.update)(appointment, scope, occurrence_date, changes)
+            logger.info("Updated appointment %s", appointment_id, extra={
+                'user': appointment.user,
+                'appointment_id': appointment.id,
+                'scope': scope,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
+
+            return JsonResponse({
+                'status': 'success',
+                **appointment_api.appointment_data(appointment)
+            })
+        except Appointment.DoesNotExist:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Appointment not found'
+            }, status=404)
+    except Exception as e:
+        logger.exception("Error updating appointment %s", appointment_id, extra={'appointment_id': appointment_id})
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
+
+@csrf_exempt
+@require_POST
+@check_session
+async def delete_appointment(request, appointment_id):
+    started = time.perf_counter()
+    try:
+        try:
+            calendar = await identity.acalendar(request)
+            appointment = await Appointment.objects.aget(id=appointment_id, calendar=calendar)
+            # Only allow deletion if the current user owns the appointment
+            if appointment.user != await identity.ausername(request):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Not authorized to delete this appointment'
+                }, status=403)
+
+            await sync_to_async(appointment_api.delete)(appointment)
+            logger.info("Deleted appointment %s", appointment_id, extra={
+                'user': appointment.user,
+                'appointment_id': appointment_id,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
+
+            return JsonResponse({
+                'status': 'success'
+            })
+        except Appointment.DoesNotExist:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Appointment not found'
+            }, status=404)
+    except Exception as e:
+        logger.exception("Error deleting appointment %s", appointment_id, extra={'appointment_id': appointment_id})
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
+
+@csrf_exempt
+@require_POST
+@check_session
+async def batch_appointments(request):
+    """Async version of ``views.batch_appointments``."""
+    started = time.perf_counter()
+    operations, error = appointment_api.parse_batch(request.body)
+    if error is not None:
+        return error
+
+    username = await identity.ausername(request)
+    try:
+        results, failed = await sync_to_async(appointment_api.batch)(operations, username, await identity.acalendar(request))
+    except Exception as e:
+        logger.exception("Error applying batch", extra={'user': username})
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
+
+    logger.info("Applied batch of %d operations", len(operations), extra={
+        'user': username,
+        'rows': len(operations),
+        'failed': failed,
+        'duration_ms': (time.perf_counter() - started) * 1000,
+    })
+    return appointment_api.batch_response(results, failed)
+
+
+@require_GET
+@check_session
+async def stream_changes(request):
+    """
+    Stream the calendar's change feed as server-sent events, starting after
+    ``cursor`` or the ``Last-Event-ID`` a reconnecting client sends. Serve it from an
+    ASGI server: each open stream then costs a coroutine rather than a
+    worker thread. Streams end after ``SHARED_CALENDAR_CHANGES_STREAM_SECONDS``
+    and browsers reconnect from the last event.
+    """
+    try:
+        cursor = int(request.headers.get('Last-Event-ID') or request.GET['cursor'])
+    except (KeyError, ValueError):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'An integer cursor is required'
+        }, status=400)
+
+    calendar = await identity.acalendar(request)
+
+    async def events():
+        stream = change_feed.stream_changes(
+            cursor,
+            getattr(settings, 'SHARED_CALENDAR_CHANGES_STREAM_SECONDS', 300),
+            getattr(settings, 'SHARED_CALENDAR_CHANGES_POLL_INTERVAL', 1),
+            calendar_id=calendar.id
+        )
+        async for changes, next_cursor in stream:
+            if changes:
+                payload = json.dumps({'cursor': next_cursor, 'changes': changes}, cls=DjangoJSONEncoder)
+                yield f'id: {next_cursor}\nevent: changes\ndata: {payload}\n\n'
+            else:
+                yield ': keepalive\n\n'
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response